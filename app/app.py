@@ -1,105 +1,185 @@
-import tkinter as tk
-from tkinter import filedialog, ttk
-import threading
-import os
-from unzip import extract_zip
-from encoding import copy_xml_and_chg_ipt_codec
-from convert import xml_to_csv
-
-class App(tk.Tk):
-    def __init__(self):
-        super().__init__()
-
-        self.title("XML to CSV Converter")
-        self.geometry("400x300")
-
-        self.create_widgets()
-
-    def create_widgets(self):
-        # ZIP file selection
-        self.zip_label = tk.Label(self, text="Select ZIP file:")
-        self.zip_label.pack(pady=10)
-
-        self.zip_button = tk.Button(self, text="Browse", command=self.select_zip)
-        self.zip_button.pack()
-
-        self.zip_path = tk.StringVar()
-        self.zip_entry = tk.Entry(self, textvariable=self.zip_path, width=50)
-        self.zip_entry.pack(pady=5)
-
-        # Output directory selection
-        self.output_label = tk.Label(self, text="Select output directory:")
-        self.output_label.pack(pady=10)
-
-        self.output_button = tk.Button(self, text="Browse", command=self.select_output)
-        self.output_button.pack()
-
-        self.output_path = tk.StringVar()
-        self.output_entry = tk.Entry(self, textvariable=self.output_path, width=50)
-        self.output_entry.pack(pady=5)
-
-        # Convert button
-        self.convert_button = tk.Button(self, text="Convert", command=self.start_conversion)
-        self.convert_button.pack(pady=20)
-
-        # Progress bar
-        self.progress = ttk.Progressbar(self, orient="horizontal", length=300, mode="determinate")
-        self.progress.pack(pady=10)
-
-        # Status label
-        self.status = tk.StringVar()
-        self.status_label = tk.Label(self, textvariable=self.status)
-        self.status_label.pack()
-
-    def select_zip(self):
-        filename = filedialog.askopenfilename(filetypes=[("ZIP files", "*.zip")])
-        self.zip_path.set(filename)
-
-    def select_output(self):
-        directory = filedialog.askdirectory()
-        self.output_path.set(directory)
-
-    def start_conversion(self):
-        zip_file = self.zip_path.get()
-        output_dir = self.output_path.get()
-
-        if not zip_file or not output_dir:
-            self.status.set("Please select both ZIP file and output directory.")
-            return
-
-        self.convert_button.config(state="disabled")
-        self.progress["value"] = 0
-        self.status.set("Starting conversion...")
-
-        thread = threading.Thread(target=self.convert_process, args=(zip_file, output_dir))
-        thread.start()
-
-    def convert_process(self, zip_file, output_dir):
-        try:
-            # Extract ZIP
-            self.status.set("Extracting ZIP file...")
-            extract_dir = os.path.join(output_dir, "extracted")
-            extract_zip(zip_file, extract_dir)
-            self.progress["value"] = 25
-
-            # Convert encoding
-            self.status.set("Converting encoding...")
-            utf8_dir = os.path.join(output_dir, "utf8")
-            copy_xml_and_chg_ipt_codec(extract_dir, utf8_dir)
-            self.progress["value"] = 50
-
-            # Convert to CSV
-            self.status.set("Converting to CSV...")
-            csv_dir = os.path.join(output_dir, "csv")
-            xml_to_csv(utf8_dir, csv_dir)
-            self.progress["value"] = 100
-
-            self.status.set("Conversion completed successfully!")
-        except Exception as e:
-            self.status.set(f"Error occurred: {str(e)}")
-        finally:
-            self.convert_button.config(state="normal")
-
-if __name__ == "__main__":
-    app = App()
+import tkinter as tk
+from tkinter import filedialog, ttk
+import threading
+import queue
+import multiprocessing
+from staged import StagedPipeline
+from metrics import METRICS, format_progress
+
+# 進捗キューを確認する間隔（ミリ秒）
+POLL_INTERVAL_MS = 100
+
+# 段階ごとのプログレスバーの範囲（各段階は並行に進むため、解析の進捗だけを表示します）
+STAGE_RANGES = {'convert': (0, 100)}
+
+class App(tk.Tk):
+    def __init__(self):
+        super().__init__()
+
+        self.title("XML to CSV Converter")
+        self.geometry("400x370")
+
+        self.create_widgets()
+
+        # 変換スレッドからの通知は、すべてキューを通してメインスレッドで反映します
+        self.messages = queue.Queue()
+        self.events = METRICS.subscribe()
+        self.stage_ranges = STAGE_RANGES
+        self.pipeline = None
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
+        self.after(POLL_INTERVAL_MS, self.poll_progress)
+
+    def create_widgets(self):
+        # ZIP file selection
+        self.zip_label = tk.Label(self, text="Select ZIP file:")
+        self.zip_label.pack(pady=10)
+
+        self.zip_button = tk.Button(self, text="Browse", command=self.select_zip)
+        self.zip_button.pack()
+
+        self.zip_path = tk.StringVar()
+        self.zip_entry = tk.Entry(self, textvariable=self.zip_path, width=50)
+        self.zip_entry.pack(pady=5)
+
+        # Output directory selection
+        self.output_label = tk.Label(self, text="Select output directory:")
+        self.output_label.pack(pady=10)
+
+        self.output_button = tk.Button(self, text="Browse", command=self.select_output)
+        self.output_button.pack()
+
+        self.output_path = tk.StringVar()
+        self.output_entry = tk.Entry(self, textvariable=self.output_path, width=50)
+        self.output_entry.pack(pady=5)
+
+        # Conversion mode
+        self.direct_mode = tk.BooleanVar(value=True)
+        self.direct_check = tk.Checkbutton(self, text="Convert directly from ZIP (no intermediate files)",
+                                           variable=self.direct_mode)
+        self.direct_check.pack()
+
+        # Convert button
+        self.convert_button = tk.Button(self, text="Convert", command=self.start_conversion)
+        self.convert_button.pack(pady=(20, 5))
+
+        # Cancel button
+        self.cancel_button = tk.Button(self, text="Cancel", command=self.cancel_conversion, state="disabled")
+        self.cancel_button.pack(pady=(0, 10))
+
+        # Progress bar
+        self.progress = ttk.Progressbar(self, orient="horizontal", length=300, mode="determinate")
+        self.progress.pack(pady=10)
+
+        # Status label
+        self.status = tk.StringVar()
+        self.status_label = tk.Label(self, textvariable=self.status)
+        self.status_label.pack()
+
+    def select_zip(self):
+        filename = filedialog.askopenfilename(filetypes=[("ZIP files", "*.zip")])
+        self.zip_path.set(filename)
+
+    def select_output(self):
+        directory = filedialog.askdirectory()
+        self.output_path.set(directory)
+
+    def start_conversion(self):
+        zip_file = self.zip_path.get()
+        output_dir = self.output_path.get()
+
+        if not zip_file or not output_dir:
+            self.status.set("Please select both ZIP file and output directory.")
+            return
+
+        self.convert_button.config(state="disabled")
+        self.progress["value"] = 0
+        self.status.set("Starting conversion...")
+
+        METRICS.reset()
+        self.pipeline = StagedPipeline(zip_file, output_dir, direct=self.direct_mode.get())
+        self.cancel_button.config(state="normal")
+        thread = threading.Thread(target=self.convert_process, args=(self.pipeline,))
+        thread.start()
+
+    def cancel_conversion(self):
+        """変換を取り消します。各段階がキューを空にして終わると、変換スレッドが完了を通知します。"""
+        if self.pipeline is not None:
+            self.pipeline.cancel()
+            self.cancel_button.config(state="disabled")
+            self.status.set("Cancelling...")
+
+    def on_close(self):
+        # 変換中に閉じた場合も、取り消して出力を閉じてから終了します
+        if self.pipeline is not None:
+            self.pipeline.cancel()
+        self.destroy()
+
+    def notify(self, status=None, progress=None, finished=False):
+        """変換スレッドから、メインスレッドで反映する表示の更新を送ります。"""
+        self.messages.put((status, progress, finished))
+
+    def poll_progress(self):
+        """変換スレッドの通知と METRICS の進捗イベントを反映します。"""
+        # 段階ごとに最新のイベントを残します。最後に届いたのが unzip や transcode のイベントでも、
+        # 同時に進んでいる convert の進捗を捨てないようにします（辞書の順序は届いた順です）
+        latest = {}
+        while True:
+            try:
+                event = self.events.get_nowait()
+            except queue.Empty:
+                break
+            latest.pop(event.stage, None)
+            latest[event.stage] = event
+        ranged = [event for stage, event in latest.items() if stage in self.stage_ranges]
+        if ranged:
+            event = ranged[-1]
+            start, end = self.stage_ranges[event.stage]
+            if event.total:
+                self.progress["value"] = start + (end - start) * min(1, event.done / event.total)
+            self.status.set(format_progress(METRICS, event))
+
+        while True:
+            try:
+                status, progress, finished = self.messages.get_nowait()
+            except queue.Empty:
+                break
+            if status is not None:
+                self.status.set(status)
+            if progress is not None:
+                self.progress["value"] = progress
+            if finished:
+                # 完了後に届いた古い進捗で表示を上書きしないよう捨てます
+                while not self.events.empty():
+                    self.events.get_nowait()
+                self.pipeline = None
+                self.convert_button.config(state="normal")
+                self.cancel_button.config(state="disabled")
+
+        self.after(POLL_INTERVAL_MS, self.poll_progress)
+
+    def convert_process(self, pipeline):
+        status, progress = None, None
+        try:
+            # ZIPの読み出し・エンコーディング変換・解析・書き込みを並行に実行します
+            # （直接変換の場合は中間ファイルを作りません）
+            self.notify("Converting...")
+            if pipeline.run():
+                status, progress = self.completed_message(), 100
+            else:
+                status = "Conversion cancelled."
+        except Exception as e:
+            status = f"Error occurred: {str(e)}"
+        finally:
+            self.notify(status, progress, finished=True)
+
+    def completed_message(self):
+        """METRICS の集計から完了時の表示を作ります。"""
+        counters = METRICS.snapshot()['counters']
+        return (f"Conversion completed successfully! ({counters.get('convert.rows', 0)} rows, "
+                f"{counters.get('convert.skipped_kind', 0)} skipped, {counters.get('convert.errors', 0)} errors)")
+
+if __name__ == "__main__":
+    # 実行ファイルとして配布した場合でも xml_to_csv のプロセスプールを使えるようにします
+    multiprocessing.freeze_support()
+    app = App()
     app.mainloop()
\ No newline at end of file
@@ -1,220 +1,773 @@
-import sys
-import os
-import csv
-import logging
-from pathlib import Path
-from xml.etree.ElementTree import parse, Element
-
-# ログの設定
-logging.basicConfig(filename='xml_to_csv_conversion.log', level=logging.INFO,
-                    format='%(asctime)s - %(levelname)s - %(message)s')
-
-def setup_paths(input_path: str, output_path: str) -> tuple:
-    """入力と出力のパスをPath objectsとして設定し、検証します。"""
-    ipt_path = Path(input_path)
-    opt_path = Path(output_path)
-
-    if not ipt_path.exists():
-        raise FileNotFoundError(f"入力パス '{input_path}' が見つかりません。")
-    if not opt_path.exists():
-        opt_path.mkdir(parents=True, exist_ok=True)
-        logging.info(f"出力ディレクトリ '{output_path}' を作成しました。")
-
-    return ipt_path, opt_path
-
-def parse_xml(xml_file: Path) -> Element:
-    """XMLファイルをパースしてルート要素を返します。"""
-    try:
-        return parse(xml_file).getroot()
-    except Exception as e:
-        logging.error(f"ファイル '{xml_file.name}' のXML解析エラー: {str(e)}")
-        raise
-
-def extract_data(elem: Element) -> list:
-    """XML要素から必要なデータを抽出します。"""
-    
-    list_in = []
-    namespaces = {'jp': 'http://www.jpo.go.jp'}
-
-    # 格納
-    list_in.append(str(elem.get('kind-of-jp'))) # 公開種別（jp）
-    list_in.append(str(elem.get('kind-of-st16'))) # 公開種別（st16）
-    list_in.append(str(elem.findtext('.//publication-reference/document-id/kind'))) # 公開種別（日本語）
-    list_in.append(str(elem.findtext('.//publication-reference/document-id/doc-number'))) # 公開番号
-    list_in.append(str(elem.findtext('.//publication-reference/document-id/date'))) # 公開日
-    list_in.append(str(elem.findtext('.//application-reference/document-id/doc-number'))) # 出願番号
-    list_in.append(str(elem.findtext('.//application-reference/document-id/date'))) # 出願日
-    list_in.append(str(elem.findtext('.//invention-title'))) # 発明の名称
-    list_in.append(str(elem.findtext('.//classification-ipc/main-clsf'))) # 国際特許分類(IPC)
-    list_in.append(str(elem.findtext('.//number-of-claims'))) # 請求項の数
-    list_in.append(str(elem.findtext('.//jp:total-pages', namespaces={'jp':'http://www.jpo.go.jp'}))) # 全頁数
-    #FI ここはappendでスペース入れないとスペース入れてくれない
-    list_in.append("      ".join((elem.find('.//classification-national')).itertext()).replace('JP', '').strip().replace('\n', '')) if elem.find('.//classification-national') != None else list_in.append('None')
-    #テーマコード
-    list_in.append("".join((elem.find('.//jp:theme-code-info', namespaces={'jp': 'http://www.jpo.go.jp'}).itertext())).replace('\n', '').strip()) if elem.find('.//jp:f-term-info', namespaces={'jp': 'http://www.jpo.go.jp'}) != None else list_in.append('None')
-    # Fターム（一部Fタームの記載の無い公開特許公報（A) があるのでエラーを吐き出す. replaceメソッドで改行文字を削除している．よくわからないけどスペースが6つついている
-    list_in.append("".join((elem.find('.//jp:f-term-info', namespaces={'jp': 'http://www.jpo.go.jp'}).itertext())).replace('\n', '').strip()) if elem.find('.//jp:f-term-info', namespaces={'jp': 'http://www.jpo.go.jp'}) != None else list_in.append('None')
-    # 出願人情報
-    list_in.append(str(elem.findtext('.//parties/jp:applicants-agents-article/jp:applicants-agents[@sequence="1"]/applicant[@sequence="1"]/addressbook[@lang="ja"]/registered-number', namespaces={'jp':'http://www.jpo.go.jp'})))
-    list_in.append(str(elem.findtext('.//parties/jp:applicants-agents-article/jp:applicants-agents[@sequence="1"]/applicant[@sequence="1"]/addressbook[@lang="ja"]/name', namespaces={'jp':'http://www.jpo.go.jp'})))
-    list_in.append(str(elem.findtext('.//parties/jp:applicants-agents-article/jp:applicants-agents[@sequence="1"]/applicant[@sequence="1"]/addressbook[@lang="ja"]/address/text', namespaces={'jp':'http://www.jpo.go.jp'})))
-    
-    # 2021/03/13 fixed applicant-agents sequence number to 1 (not 2, 3, ...5)
-    # list_in.append(str(elem.findtext('.//parties/jp:applicants-agents-article/jp:applicants-agents[@sequence="2"]/applicant[@sequence="2"]/addressbook[@lang="ja"]/registered-number', namespaces={'jp':'http://www.jpo.go.jp'})))
-    # list_in.append(str(elem.findtext('.//parties/jp:applicants-agents-article/jp:applicants-agents[@sequence="2"]/applicant[@sequence="2"]/addressbook[@lang="ja"]/name', namespaces={'jp':'http://www.jpo.go.jp'})))
-    # list_in.append(str(elem.findtext('.//parties/jp:applicants-agents-article/jp:applicants-agents[@sequence="2"]/applicant[@sequence="2"]/addressbook[@lang="ja"]/address/text', namespaces={'jp':'http://www.jpo.go.jp'})))
-    list_in.append(str(elem.findtext('.//parties/jp:applicants-agents-article/jp:applicants-agents[@sequence="1"]/applicant[@sequence="2"]/addressbook[@lang="ja"]/registered-number', namespaces={'jp':'http://www.jpo.go.jp'})))
-    list_in.append(str(elem.findtext('.//parties/jp:applicants-agents-article/jp:applicants-agents[@sequence="1"]/applicant[@sequence="2"]/addressbook[@lang="ja"]/name', namespaces={'jp':'http://www.jpo.go.jp'})))
-    list_in.append(str(elem.findtext('.//parties/jp:applicants-agents-article/jp:applicants-agents[@sequence="1"]/applicant[@sequence="2"]/addressbook[@lang="ja"]/address/text', namespaces={'jp':'http://www.jpo.go.jp'})))
-    list_in.append(str(elem.findtext('.//parties/jp:applicants-agents-article/jp:applicants-agents[@sequence="1"]/applicant[@sequence="3"]/addressbook[@lang="ja"]/registered-number', namespaces={'jp':'http://www.jpo.go.jp'})))
-    list_in.append(str(elem.findtext('.//parties/jp:applicants-agents-article/jp:applicants-agents[@sequence="1"]/applicant[@sequence="3"]/addressbook[@lang="ja"]/name', namespaces={'jp':'http://www.jpo.go.jp'})))
-    list_in.append(str(elem.findtext('.//parties/jp:applicants-agents-article/jp:applicants-agents[@sequence="1"]/applicant[@sequence="3"]/addressbook[@lang="ja"]/address/text', namespaces={'jp':'http://www.jpo.go.jp'})))
-    list_in.append(str(elem.findtext('.//parties/jp:applicants-agents-article/jp:applicants-agents[@sequence="1"]/applicant[@sequence="4"]/addressbook[@lang="ja"]/registered-number', namespaces={'jp':'http://www.jpo.go.jp'})))
-    list_in.append(str(elem.findtext('.//parties/jp:applicants-agents-article/jp:applicants-agents[@sequence="1"]/applicant[@sequence="4"]/addressbook[@lang="ja"]/name', namespaces={'jp':'http://www.jpo.go.jp'})))
-    list_in.append(str(elem.findtext('.//parties/jp:applicants-agents-article/jp:applicants-agents[@sequence="1"]/applicant[@sequence="4"]/addressbook[@lang="ja"]/address/text', namespaces={'jp':'http://www.jpo.go.jp'})))
-    list_in.append(str(elem.findtext('.//parties/jp:applicants-agents-article/jp:applicants-agents[@sequence="1"]/applicant[@sequence="5"]/addressbook[@lang="ja"]/registered-number', namespaces={'jp':'http://www.jpo.go.jp'})))
-    list_in.append(str(elem.findtext('.//parties/jp:applicants-agents-article/jp:applicants-agents[@sequence="1"]/applicant[@sequence="5"]/addressbook[@lang="ja"]/name', namespaces={'jp':'http://www.jpo.go.jp'})))
-    list_in.append(str(elem.findtext('.//parties/jp:applicants-agents-article/jp:applicants-agents[@sequence="1"]/applicant[@sequence="5"]/addressbook[@lang="ja"]/address/text', namespaces={'jp':'http://www.jpo.go.jp'})))
-    list_in.append(str(elem.findtext('.//parties/jp:applicants-agents-article/jp:applicants-agents[@sequence="1"]/applicant[@sequence="6"]/addressbook[@lang="ja"]/registered-number', namespaces={'jp':'http://www.jpo.go.jp'})))
-    list_in.append(str(elem.findtext('.//parties/jp:applicants-agents-article/jp:applicants-agents[@sequence="1"]/applicant[@sequence="6"]/addressbook[@lang="ja"]/name', namespaces={'jp':'http://www.jpo.go.jp'})))
-    list_in.append(str(elem.findtext('.//parties/jp:applicants-agents-article/jp:applicants-agents[@sequence="1"]/applicant[@sequence="6"]/addressbook[@lang="ja"]/address/text', namespaces={'jp':'http://www.jpo.go.jp'})))
-    list_in.append(str(elem.findtext('.//parties/jp:applicants-agents-article/jp:applicants-agents[@sequence="1"]/applicant[@sequence="7"]/addressbook[@lang="ja"]/registered-number', namespaces={'jp':'http://www.jpo.go.jp'})))
-    list_in.append(str(elem.findtext('.//parties/jp:applicants-agents-article/jp:applicants-agents[@sequence="1"]/applicant[@sequence="7"]/addressbook[@lang="ja"]/name', namespaces={'jp':'http://www.jpo.go.jp'})))
-    list_in.append(str(elem.findtext('.//parties/jp:applicants-agents-article/jp:applicants-agents[@sequence="1"]/applicant[@sequence="7"]/addressbook[@lang="ja"]/registered-number', namespaces={'jp':'http://www.jpo.go.jp'})))
-    list_in.append(str(elem.findtext('.//parties/jp:applicants-agents-article/jp:applicants-agents[@sequence="1"]/applicant[@sequence="8"]/addressbook[@lang="ja"]/name', namespaces={'jp':'http://www.jpo.go.jp'})))
-    list_in.append(str(elem.findtext('.//parties/jp:applicants-agents-article/jp:applicants-agents[@sequence="1"]/applicant[@sequence="8"]/addressbook[@lang="ja"]/registered-number', namespaces={'jp':'http://www.jpo.go.jp'})))
-    list_in.append(str(elem.findtext('.//parties/jp:applicants-agents-article/jp:applicants-agents[@sequence="1"]/applicant[@sequence="8"]/addressbook[@lang="ja"]/name', namespaces={'jp':'http://www.jpo.go.jp'})))
-    list_in.append(str(elem.findtext('.//parties/jp:applicants-agents-article/jp:applicants-agents[@sequence="1"]/applicant[@sequence="9"]/addressbook[@lang="ja"]/registered-number', namespaces={'jp':'http://www.jpo.go.jp'})))
-    list_in.append(str(elem.findtext('.//parties/jp:applicants-agents-article/jp:applicants-agents[@sequence="1"]/applicant[@sequence="9"]/addressbook[@lang="ja"]/name', namespaces={'jp':'http://www.jpo.go.jp'})))
-    list_in.append(str(elem.findtext('.//parties/jp:applicants-agents-article/jp:applicants-agents[@sequence="1"]/applicant[@sequence="9"]/addressbook[@lang="ja"]/registered-number', namespaces={'jp':'http://www.jpo.go.jp'})))
-    list_in.append(str(elem.findtext('.//parties/jp:applicants-agents-article/jp:applicants-agents[@sequence="1"]/applicant[@sequence="10"]/addressbook[@lang="ja"]/name', namespaces={'jp':'http://www.jpo.go.jp'})))
-    list_in.append(str(elem.findtext('.//parties/jp:applicants-agents-article/jp:applicants-agents[@sequence="1"]/applicant[@sequence="10"]/addressbook[@lang="ja"]/registered-number', namespaces={'jp':'http://www.jpo.go.jp'})))
-    list_in.append(str(elem.findtext('.//parties/jp:applicants-agents-article/jp:applicants-agents[@sequence="1"]/applicant[@sequence="10"]/addressbook[@lang="ja"]/name', namespaces={'jp':'http://www.jpo.go.jp'})))
-    list_in.append(str(elem.findtext('.//parties/jp:applicants-agents-article/jp:applicants-agents[@sequence="1"]/applicant[@sequence="11"]/addressbook[@lang="ja"]/registered-number', namespaces={'jp':'http://www.jpo.go.jp'})))
-    list_in.append(str(elem.findtext('.//parties/jp:applicants-agents-article/jp:applicants-agents[@sequence="1"]/applicant[@sequence="11"]/addressbook[@lang="ja"]/name', namespaces={'jp':'http://www.jpo.go.jp'})))
-    list_in.append(str(elem.findtext('.//parties/jp:applicants-agents-article/jp:applicants-agents[@sequence="1"]/applicant[@sequence="11"]/addressbook[@lang="ja"]/registered-number', namespaces={'jp':'http://www.jpo.go.jp'})))
-    list_in.append(str(elem.findtext('.//parties/jp:applicants-agents-article/jp:applicants-agents[@sequence="1"]/applicant[@sequence="12"]/addressbook[@lang="ja"]/name', namespaces={'jp':'http://www.jpo.go.jp'})))
-    list_in.append(str(elem.findtext('.//parties/jp:applicants-agents-article/jp:applicants-agents[@sequence="1"]/applicant[@sequence="12"]/addressbook[@lang="ja"]/registered-number', namespaces={'jp':'http://www.jpo.go.jp'})))
-    list_in.append(str(elem.findtext('.//parties/jp:applicants-agents-article/jp:applicants-agents[@sequence="1"]/applicant[@sequence="12"]/addressbook[@lang="ja"]/name', namespaces={'jp':'http://www.jpo.go.jp'})))
-    # 代理人情報
-    # 2021/03/13 fixed applicant-agents sequence number to 1 (not 2, 3, ...5)
-    list_in.append(str(elem.findtext('.//parties/jp:applicants-agents-article/jp:applicants-agents[@sequence="1"]/agent[@sequence="1"][@jp:kind="representative"]/addressbook/registered-number', namespaces={'jp':'http://www.jpo.go.jp'})))
-    list_in.append(str(elem.findtext('.//parties/jp:applicants-agents-article/jp:applicants-agents[@sequence="1"]/agent[@sequence="1"][@jp:kind="representative"]/addressbook/name', namespaces={'jp':'http://www.jpo.go.jp'})))
-    list_in.append(str(elem.findtext('.//parties/jp:applicants-agents-article/jp:applicants-agents[@sequence="1"]/agent[@sequence="2"][@jp:kind="representative"]/addressbook/registered-number', namespaces={'jp':'http://www.jpo.go.jp'})))
-    list_in.append(str(elem.findtext('.//parties/jp:applicants-agents-article/jp:applicants-agents[@sequence="1"]/agent[@sequence="2"][@jp:kind="representative"]/addressbook/name', namespaces={'jp':'http://www.jpo.go.jp'})))
-    list_in.append(str(elem.findtext('.//parties/jp:applicants-agents-article/jp:applicants-agents[@sequence="1"]/agent[@sequence="3"][@jp:kind="representative"]/addressbook/registered-number', namespaces={'jp':'http://www.jpo.go.jp'})))
-    list_in.append(str(elem.findtext('.//parties/jp:applicants-agents-article/jp:applicants-agents[@sequence="1"]/agent[@sequence="3"][@jp:kind="representative"]/addressbook/name', namespaces={'jp':'http://www.jpo.go.jp'})))
-    list_in.append(str(elem.findtext('.//parties/jp:applicants-agents-article/jp:applicants-agents[@sequence="1"]/agent[@sequence="4"][@jp:kind="representative"]/addressbook/registered-number', namespaces={'jp':'http://www.jpo.go.jp'})))
-    list_in.append(str(elem.findtext('.//parties/jp:applicants-agents-article/jp:applicants-agents[@sequence="1"]/agent[@sequence="4"][@jp:kind="representative"]/addressbook/name', namespaces={'jp':'http://www.jpo.go.jp'})))
-    list_in.append(str(elem.findtext('.//parties/jp:applicants-agents-article/jp:applicants-agents[@sequence="1"]/agent[@sequence="5"][@jp:kind="representative"]/addressbook/registered-number', namespaces={'jp':'http://www.jpo.go.jp'})))
-    list_in.append(str(elem.findtext('.//parties/jp:applicants-agents-article/jp:applicants-agents[@sequence="1"]/agent[@sequence="5"][@jp:kind="representative"]/addressbook/name', namespaces={'jp':'http://www.jpo.go.jp'})))
-    list_in.append(str(elem.findtext('.//parties/jp:applicants-agents-article/jp:applicants-agents[@sequence="1"]/agent[@sequence="6"][@jp:kind="representative"]/addressbook/registered-number', namespaces={'jp':'http://www.jpo.go.jp'})))
-    list_in.append(str(elem.findtext('.//parties/jp:applicants-agents-article/jp:applicants-agents[@sequence="1"]/agent[@sequence="6"][@jp:kind="representative"]/addressbook/name', namespaces={'jp':'http://www.jpo.go.jp'})))
-    list_in.append(str(elem.findtext('.//parties/jp:applicants-agents-article/jp:applicants-agents[@sequence="1"]/agent[@sequence="7"][@jp:kind="representative"]/addressbook/registered-number', namespaces={'jp':'http://www.jpo.go.jp'})))
-    list_in.append(str(elem.findtext('.//parties/jp:applicants-agents-article/jp:applicants-agents[@sequence="1"]/agent[@sequence="7"][@jp:kind="representative"]/addressbook/name', namespaces={'jp':'http://www.jpo.go.jp'})))
-    list_in.append(str(elem.findtext('.//parties/jp:applicants-agents-article/jp:applicants-agents[@sequence="1"]/agent[@sequence="8"][@jp:kind="representative"]/addressbook/registered-number', namespaces={'jp':'http://www.jpo.go.jp'})))
-    list_in.append(str(elem.findtext('.//parties/jp:applicants-agents-article/jp:applicants-agents[@sequence="1"]/agent[@sequence="8"][@jp:kind="representative"]/addressbook/name', namespaces={'jp':'http://www.jpo.go.jp'})))
-    list_in.append(str(elem.findtext('.//parties/jp:applicants-agents-article/jp:applicants-agents[@sequence="1"]/agent[@sequence="9"][@jp:kind="representative"]/addressbook/registered-number', namespaces={'jp':'http://www.jpo.go.jp'})))
-    list_in.append(str(elem.findtext('.//parties/jp:applicants-agents-article/jp:applicants-agents[@sequence="1"]/agent[@sequence="9"][@jp:kind="representative"]/addressbook/name', namespaces={'jp':'http://www.jpo.go.jp'})))
-    list_in.append(str(elem.findtext('.//parties/jp:applicants-agents-article/jp:applicants-agents[@sequence="1"]/agent[@sequence="10"][@jp:kind="representative"]/addressbook/registered-number', namespaces={'jp':'http://www.jpo.go.jp'})))
-    list_in.append(str(elem.findtext('.//parties/jp:applicants-agents-article/jp:applicants-agents[@sequence="1"]/agent[@sequence="10"][@jp:kind="representative"]/addressbook/name', namespaces={'jp':'http://www.jpo.go.jp'})))
-    list_in.append(str(elem.findtext('.//parties/jp:applicants-agents-article/jp:applicants-agents[@sequence="1"]/agent[@sequence="11"][@jp:kind="representative"]/addressbook/registered-number', namespaces={'jp':'http://www.jpo.go.jp'})))
-    list_in.append(str(elem.findtext('.//parties/jp:applicants-agents-article/jp:applicants-agents[@sequence="1"]/agent[@sequence="11"][@jp:kind="representative"]/addressbook/name', namespaces={'jp':'http://www.jpo.go.jp'})))
-    list_in.append(str(elem.findtext('.//parties/jp:applicants-agents-article/jp:applicants-agents[@sequence="1"]/agent[@sequence="12"][@jp:kind="representative"]/addressbook/registered-number', namespaces={'jp':'http://www.jpo.go.jp'})))
-    list_in.append(str(elem.findtext('.//parties/jp:applicants-agents-article/jp:applicants-agents[@sequence="1"]/agent[@sequence="12"][@jp:kind="representative"]/addressbook/name', namespaces={'jp':'http://www.jpo.go.jp'})))
-    # 発明者情報
-    # 2021/03/13 fixed applicant-agents sequence number to 1 (not 2, 3, ...5)
-    list_in.append(str(elem.findtext('.//parties/inventors/inventor[@sequence="1"]/addressbook/name')))
-    list_in.append(str(elem.findtext('.//parties/inventors/inventor[@sequence="1"]/addressbook/address/text')))
-    list_in.append(str(elem.findtext('.//parties/inventors/inventor[@sequence="2"]/addressbook/name')))
-    list_in.append(str(elem.findtext('.//parties/inventors/inventor[@sequence="2"]/addressbook/address/text')))
-    list_in.append(str(elem.findtext('.//parties/inventors/inventor[@sequence="3"]/addressbook/name')))
-    list_in.append(str(elem.findtext('.//parties/inventors/inventor[@sequence="3"]/addressbook/address/text')))
-    list_in.append(str(elem.findtext('.//parties/inventors/inventor[@sequence="4"]/addressbook/name')))
-    list_in.append(str(elem.findtext('.//parties/inventors/inventor[@sequence="4"]/addressbook/address/text')))
-    list_in.append(str(elem.findtext('.//parties/inventors/inventor[@sequence="5"]/addressbook/name')))
-    list_in.append(str(elem.findtext('.//parties/inventors/inventor[@sequence="5"]/addressbook/address/text')))
-    list_in.append(str(elem.findtext('.//parties/inventors/inventor[@sequence="6"]/addressbook/name')))
-    list_in.append(str(elem.findtext('.//parties/inventors/inventor[@sequence="6"]/addressbook/address/text')))
-    list_in.append(str(elem.findtext('.//parties/inventors/inventor[@sequence="7"]/addressbook/name')))
-    list_in.append(str(elem.findtext('.//parties/inventors/inventor[@sequence="7"]/addressbook/address/text')))
-    list_in.append(str(elem.findtext('.//parties/inventors/inventor[@sequence="8"]/addressbook/name')))
-    list_in.append(str(elem.findtext('.//parties/inventors/inventor[@sequence="8"]/addressbook/address/text')))
-    list_in.append(str(elem.findtext('.//parties/inventors/inventor[@sequence="9"]/addressbook/name')))
-    list_in.append(str(elem.findtext('.//parties/inventors/inventor[@sequence="9"]/addressbook/address/text')))
-    list_in.append(str(elem.findtext('.//parties/inventors/inventor[@sequence="10"]/addressbook/name')))
-    list_in.append(str(elem.findtext('.//parties/inventors/inventor[@sequence="10"]/addressbook/address/text')))
-    list_in.append(str(elem.findtext('.//parties/inventors/inventor[@sequence="11"]/addressbook/name')))
-    list_in.append(str(elem.findtext('.//parties/inventors/inventor[@sequence="11"]/addressbook/address/text')))
-    list_in.append(str(elem.findtext('.//parties/inventors/inventor[@sequence="12"]/addressbook/name')))
-    list_in.append(str(elem.findtext('.//parties/inventors/inventor[@sequence="12"]/addressbook/address/text')))
-    #要約【課題】＋【解決手段】＋【選択図】
-    list_in.append("    ".join((elem.find('.//abstract/p').itertext())).replace('\n', '').strip())  if elem.find('.//abstract/p') != None else list_in.append('None')
-    # 請求項（すべて）
-    list_in.append("    ".join((elem.find('.//claims').itertext())).replace('\n', '').strip()) if elem.find('.//claims') != None else list_in.append('None')
-    # 技術分野（すべて）
-    list_in.append("    ".join((elem.find('.//technical-field').itertext())).replace('\n', '').strip()) if elem.find('.//technical-field') != None else list_in.append('None')
-    # 背景技術（すべて）
-    list_in.append("    ".join((elem.find('.//background-art').itertext())).replace('\n', '').strip()) if elem.find('.//background-art') != None else list_in.append('None')
-    # 特許文献（すべて）
-    list_in.append("    ".join((elem.find('.//patent-literature').itertext())).replace('\n', '').strip()) if elem.find('.//patent-literature') != None else list_in.append('None')
-    # 非特許文献（すべて）
-    list_in.append("    ".join((elem.find('.//non-patent-literature').itertext())).replace('\n', '').strip()) if elem.find('.//non-patent-literature') != None else list_in.append('None')
-    # 発明が解決しようとする課題
-    list_in.append("    ".join((elem.find('.//tech-problem').itertext())).replace('\n', '').strip()) if elem.find('.//tech-problem') != None else list_in.append('None')
-    # 発明を解決するための手段
-    list_in.append("    ".join((elem.find('.//tech-solution').itertext())).replace('\n', '').strip()) if elem.find('.//tech-solution') != None else list_in.append('None')
-    # 発明の効果
-    list_in.append("    ".join((elem.find('.//advantageous-effects').itertext())).replace('\n', '').strip()) if elem.find('.//advantageous-effects') != None else list_in.append('None')
-    # 発明を実施するための形態
-    list_in.append("    ".join((elem.find('.//description-of-embodiments').itertext())).replace('\n', '').strip().rstrip('\n')) if elem.find('.//description-of-embodiments') != None else list_in.append('None')
-    # 産業利用上の可能性
-    list_in.append("    ".join((elem.find('.//industrial-applicability').itertext())).replace('\n', '').strip()) if elem.find('.//industrial-applicability') != None else list_in.append('None')
-    # 図面の簡単な説明
-    list_in.append("    ".join((elem.find('.//description-of-drawings').itertext())).replace('\n', '').strip()) if elem.find('.//description-of-drawings') != None else list_in.append('None')
-   
-    return list_in
-
-def write_to_csv(data: list, csv_file: Path):
-    """抽出したデータをCSVファイルに書き込みます。"""
-    try:
-        with csv_file.open('a', newline='', encoding='cp932') as f:
-            writer = csv.writer(f, lineterminator='\n')
-            writer.writerow(data)
-        logging.info(f"データをCSVファイル '{csv_file.name}' に追加しました。")
-    except Exception as e:
-        logging.error(f"CSVファイル '{csv_file.name}' への書き込み中にエラーが発生しました: {str(e)}")
-        raise
-
-def xml_to_csv(input_path: str, output_path: str):
-    """指定されたディレクトリ内のすべてのXMLファイルを処理し、CSVに変換します。"""
-    try:
-        ipt_path, opt_path = setup_paths(input_path, output_path)
-        xml_files = list(ipt_path.glob('**/*.xml'))
-
-        if not xml_files:
-            logging.warning(f"入力ディレクトリ '{input_path}' にXMLファイルが見つかりません。")
-            return
-
-        for xml_file in xml_files:
-            try:
-                root = parse_xml(xml_file)
-                judge_status = root.findtext('.//publication-reference/document-id/kind')
-                if judge_status in ["公開特許公報(A)", "公表特許公報(A)"]:
-                    data = extract_data(root)
-                    csv_file = opt_path / f"{data[3]}.csv"  # data[3] は公開日
-                    write_to_csv(data, csv_file)
-            except Exception as e:
-                logging.error(f"ファイル '{xml_file.name}' の処理中にエラーが発生しました: {str(e)}")
-
-        logging.info(f"すべてのXMLファイルの処理が完了しました。処理されたファイル数: {len(xml_files)}")
-    except Exception as e:
-        logging.error(f"処理中に予期しないエラーが発生しました: {str(e)}")
-
-if __name__ == "__main__":
-    if len(sys.argv) != 3:
-        print("使用方法: python convert.py <入力ディレクトリ> <出力ディレクトリ>")
-        sys.exit(1)
-
-    input_dir, output_dir = sys.argv[1], sys.argv[2]
-    xml_to_csv(input_dir, output_dir)
\ No newline at end of file
+import os
+import re
+import hashlib
+import time
+import logging
+import argparse
+import threading
+import contextlib
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Callable, Iterable, NamedTuple, Optional
+from xml.etree.ElementTree import iterparse, parse, Element
+
+from metrics import setup_logging
+setup_logging('xml_to_csv_conversion.log')
+
+from writer import PARTITIONS
+from sinks import FORMATS, open_sink
+from manifest import Manifest, FingerprintReader
+from encoding import declared_encoding
+from metrics import METRICS, console_stats
+from scanner import add_selection_arguments, select_sources
+
+try:
+    from lxml import etree as lxml_etree
+except ImportError:  # lxml はインストールされている場合だけ使います
+    lxml_etree = None
+
+def setup_paths(input_path: str, output_path: str) -> tuple:
+    """入力と出力のパスをPath objectsとして設定し、検証します。"""
+    ipt_path = Path(input_path)
+    opt_path = Path(output_path)
+
+    if not ipt_path.exists():
+        raise FileNotFoundError(f"入力パス '{input_path}' が見つかりません。")
+    if not opt_path.exists():
+        opt_path.mkdir(parents=True, exist_ok=True)
+        logging.info(f"出力ディレクトリ '{output_path}' を作成しました。")
+
+    return ipt_path, opt_path
+
+# 変換対象の公開種別
+TARGET_KINDS = ("公開特許公報(A)", "公表特許公報(A)")
+
+# iterparse モードで本文を取り出した後に子要素を破棄する要素（どちらも _joined_text で整形する列）
+COMPACT_TAGS = {'claims', 'description-of-embodiments'}
+
+# 解析エンジン（etree: 標準ライブラリの ElementTree、lxml: lxml.etree）
+ENGINES = ['etree', 'lxml']
+# 既定は etree です。lxml は速い代わりに文書全体を読み込んで木全体を作るため、iterparse での
+# 本文の子要素の破棄や FieldLimit によるメモリの節約が効かず、大きな公報ではメモリ使用量が増えます。
+DEFAULT_ENGINE = 'etree'
+
+def resolve_engine(engine: Optional[str] = None) -> str:
+    """解析エンジン名を確定します。省略時は DEFAULT_ENGINE（etree）を使います。"""
+    engine = engine or DEFAULT_ENGINE
+    if engine not in ENGINES:
+        raise ValueError(f"解析エンジン '{engine}' は指定できません。{ENGINES} から選んでください。")
+    if engine == 'lxml' and lxml_etree is None:
+        raise ImportError("lxml エンジンを使うには lxml をインストールしてください。")
+    return engine
+
+def parse_xml(xml_file: Path, kinds: Optional[Iterable[str]] = None,
+              engine: Optional[str] = None, field_limit: Optional['FieldLimit'] = None) -> Optional[Element]:
+    """XMLファイルをパースしてルート要素を返します。
+
+    xml_file にはパスのほか、name 属性を持つファイルオブジェクトも指定できます。
+    kinds を指定すると、公開種別が kinds に含まれない文書では None を返します
+    （etree では iterparse で逐次解析し、種別を読んだ時点で解析を打ち切ります）。
+    engine に 'lxml' を指定すると lxml で解析します。lxml の要素も extract_data にそのまま渡せます。
+    field_limit は iterparse で本文を取り出すときに適用します（extract_data にも同じ値を渡します）。
+    """
+    try:
+        if resolve_engine(engine) == 'lxml':
+            return _lxml_parse(xml_file, None if kinds is None else set(kinds))
+        if kinds is None:
+            return parse(xml_file).getroot()
+        return _iterparse_xml(xml_file, set(kinds), field_limit)
+    except Exception as e:
+        logging.error(f"ファイル '{xml_file.name}' のXML解析エラー: {str(e)}")
+        raise
+
+JP_NS = 'http://www.jpo.go.jp'
+NAMESPACES = {'jp': JP_NS}
+
+# 出願人・代理人・発明者のパス。{n} は sequence 番号に置き換わります。
+APPLICANT_PATH = 'parties/jp:applicants-agents-article/jp:applicants-agents[@sequence="1"]/applicant[@sequence="{n}"]/addressbook[@lang="ja"]/'
+AGENT_PATH = 'parties/jp:applicants-agents-article/jp:applicants-agents[@sequence="1"]/agent[@sequence="{n}"][@jp:kind="representative"]/addressbook/'
+INVENTOR_PATH = 'parties/inventors/inventor[@sequence="{n}"]/addressbook/'
+
+class ColumnSpec(NamedTuple):
+    """CSVの1列分の定義です。
+
+    path は `.//` を省略した ElementPath 形式で、'.' はルート要素を表します。
+    rule は見つかった要素から値を作る関数で、要素が無い場合の値は 'None' です。
+    guard を指定した場合は、guard の要素が存在するときだけ path の値を使います。
+    type は型付きの出力先（sinks.py）での列の型で、'text'・'int'・'date' のいずれかです。
+    """
+    name: str
+    path: str
+    rule: Callable[[Element], str]
+    seq: Optional[int] = None
+    guard: Optional[str] = None
+    type: str = 'text'
+
+def _findtext(elem: Element) -> str:
+    return elem.text or ''
+
+def _attr(name: str) -> Callable[[Element], str]:
+    return lambda elem: str(elem.get(name))
+
+# 本文の列（_joined_text）で断片の間に入れる文字列
+TEXT_SEPARATOR = "    "
+
+def _cleaned_pieces(elem: Element, separator: str):
+    """要素の本文を、改行と前後の空白を除いた断片に分けて順に返します。
+
+    連結すると separator.join(elem.itertext()).replace('\\n', '').strip() と同じ文字列になります。
+    本文全体をつないだ文字列や改行を除いた文字列などの途中の文字列を作らないため、
+    数MBの本文でも余分なコピーは断片の大きさで済みます。
+    """
+    last = None  # 最後に見つかった空白以外を含む断片（末尾の空白を除くため、次の断片まで保留します）
+    gap = []     # last より後の空白だけの断片
+    for piece in elem.itertext():
+        piece = piece.replace('\n', '')
+        if not piece or piece.isspace():
+            if last is not None:
+                gap.append(piece)
+            continue
+        if last is None:
+            last = piece.lstrip()
+            continue
+        yield last
+        for blank in gap:
+            yield separator
+            yield blank
+        gap.clear()
+        yield separator
+        last = piece
+    if last is not None:
+        yield last.rstrip()
+
+def _joined_text(elem: Element) -> str:
+    return ''.join(_cleaned_pieces(elem, TEXT_SEPARATOR))
+
+def _fi_text(elem: Element) -> str:
+    # FI ここはスペース入れないとスペース入れてくれない
+    return "      ".join(elem.itertext()).replace('JP', '').strip().replace('\n', '')
+
+def _term_text(elem: Element) -> str:
+    return ''.join(_cleaned_pieces(elem, ''))
+
+def _applicant(n: int, field: str) -> ColumnSpec:
+    label = {'registered-number': '登録番号', 'name': '名称', 'address/text': '住所'}[field]
+    return ColumnSpec(f"出願人{n}_{label}", APPLICANT_PATH + field, _findtext, seq=n)
+
+# CSVの列定義（この並びがそのままCSVの列順になります）
+COLUMN_SPECS = [
+    ColumnSpec('公開種別（jp）', '.', _attr('kind-of-jp')),
+    ColumnSpec('公開種別（st16）', '.', _attr('kind-of-st16')),
+    ColumnSpec('公開種別（日本語）', 'publication-reference/document-id/kind', _findtext),
+    ColumnSpec('公開番号', 'publication-reference/document-id/doc-number', _findtext),
+    ColumnSpec('公開日', 'publication-reference/document-id/date', _findtext, type='date'),
+    ColumnSpec('出願番号', 'application-reference/document-id/doc-number', _findtext),
+    ColumnSpec('出願日', 'application-reference/document-id/date', _findtext, type='date'),
+    ColumnSpec('発明の名称', 'invention-title', _findtext),
+    ColumnSpec('国際特許分類(IPC)', 'classification-ipc/main-clsf', _findtext),
+    ColumnSpec('請求項の数', 'number-of-claims', _findtext, type='int'),
+    ColumnSpec('全頁数', 'jp:total-pages', _findtext, type='int'),
+    ColumnSpec('FI', 'classification-national', _fi_text),
+    # テーマコード（従来どおり Fターム の有無で判定します）
+    ColumnSpec('テーマコード', 'jp:theme-code-info', _term_text, guard='jp:f-term-info'),
+    ColumnSpec('Fターム', 'jp:f-term-info', _term_text),
+]
+# 出願人情報
+# 2021/03/13 fixed applicant-agents sequence number to 1 (not 2, 3, ...5)
+COLUMN_SPECS += [_applicant(n, field) for n in range(1, 7)
+                 for field in ('registered-number', 'name', 'address/text')]
+# sequence 7 以降は既存のCSVと列を揃えるため、従来の並び（登録番号・名称の交互）を維持します。
+COLUMN_SPECS += [_applicant(n, field) for n, fields in
+                 ((7, ('registered-number', 'name', 'registered-number')),
+                  (8, ('name', 'registered-number', 'name')),
+                  (9, ('registered-number', 'name', 'registered-number')),
+                  (10, ('name', 'registered-number', 'name')),
+                  (11, ('registered-number', 'name', 'registered-number')),
+                  (12, ('name', 'registered-number', 'name')))
+                 for field in fields]
+# 代理人情報
+COLUMN_SPECS += [ColumnSpec(f"代理人{n}_{label}", AGENT_PATH + field, _findtext, seq=n)
+                 for n in range(1, 13)
+                 for field, label in (('registered-number', '登録番号'), ('name', '名称'))]
+# 発明者情報
+COLUMN_SPECS += [ColumnSpec(f"発明者{n}_{label}", INVENTOR_PATH + field, _findtext, seq=n)
+                 for n in range(1, 13)
+                 for field, label in (('name', '氏名'), ('address/text', '住所'))]
+COLUMN_SPECS += [
+    ColumnSpec('要約', 'abstract/p', _joined_text),  # 【課題】＋【解決手段】＋【選択図】
+    ColumnSpec('請求項', 'claims', _joined_text),
+    ColumnSpec('技術分野', 'technical-field', _joined_text),
+    ColumnSpec('背景技術', 'background-art', _joined_text),
+    ColumnSpec('特許文献', 'patent-literature', _joined_text),
+    ColumnSpec('非特許文献', 'non-patent-literature', _joined_text),
+    ColumnSpec('発明が解決しようとする課題', 'tech-problem', _joined_text),
+    ColumnSpec('発明を解決するための手段', 'tech-solution', _joined_text),
+    ColumnSpec('発明の効果', 'advantageous-effects', _joined_text),
+    ColumnSpec('発明を実施するための形態', 'description-of-embodiments', _joined_text),
+    ColumnSpec('産業利用上の可能性', 'industrial-applicability', _joined_text),
+    ColumnSpec('図面の簡単な説明', 'description-of-drawings', _joined_text),
+]
+
+def _unique_names(specs: list) -> list:
+    """列名の一覧を返します。重複する列名（出願人7以降）には '_2' などを付けます。"""
+    names = []
+    for spec in specs:
+        name, count = spec.name, 1
+        while name in names:
+            count += 1
+            name = f"{spec.name}_{count}"
+        names.append(name)
+    return names
+
+COLUMN_NAMES = _unique_names(COLUMN_SPECS)
+# 型付きの出力先に渡す (列名, 型) のリスト
+COLUMNS = [(name, spec.type) for name, spec in zip(COLUMN_NAMES, COLUMN_SPECS)]
+
+_STEP_RE = re.compile(r'([\w:.-]+)((?:\[@[\w:.-]+="[^"]*"\])*)$')
+_PREDICATE_RE = re.compile(r'\[@([\w:.-]+)="([^"]*)"\]')
+
+def _qname(name: str) -> str:
+    """'jp:xxx' 形式の名前を ElementTree の '{名前空間}xxx' 形式に変換します。"""
+    prefix, sep, local = name.rpartition(':')
+    return f"{{{NAMESPACES[prefix]}}}{local}" if sep else name
+
+class _PathPattern:
+    """列定義のパスを1回だけコンパイルした照合器です。
+
+    '{n}' を含む述語は sequence 番号の取り出しとして扱い、照合結果のキーに含めます。
+    """
+
+    def __init__(self, path: str):
+        self.steps = []
+        for step in path.split('/'):
+            match = _STEP_RE.match(step)
+            if not match:
+                raise ValueError(f"列定義のパス '{path}' を解釈できません。")
+            predicates = tuple((_qname(key), value)
+                               for key, value in _PREDICATE_RE.findall(match.group(2)))
+            self.steps.append((_qname(match.group(1)), predicates))
+        self.tag = self.steps[-1][0]
+
+    def match(self, elem: Element, ancestors: list):
+        """elem がパスに一致すれば取り出した sequence 番号（無ければ None）を返します。
+
+        一致しない場合は False を返します。ancestors はルートから親までの要素です。
+        """
+        # './/' の先頭はルート自身には一致しないため、ルートより下に収まる必要があります。
+        if len(self.steps) >= len(ancestors) + 1:
+            return False
+        seq = None
+        node = elem
+        for depth, (tag, predicates) in enumerate(reversed(self.steps)):
+            if depth:
+                node = ancestors[-depth]
+                if node.tag != tag:
+                    return False
+            for key, value in predicates:
+                actual = node.get(key)
+                if value == '{n}':
+                    if actual is None:
+                        return False
+                    seq = actual
+                elif actual != value:
+                    return False
+        return seq
+
+def _compile_specs(specs: list) -> dict:
+    """列定義のパスをコンパイルし、末尾のタグ名から引ける辞書を返します。"""
+    patterns = {}
+    for spec in specs:
+        for path in (spec.path, spec.guard):
+            if path and path != '.' and path not in patterns:
+                patterns[path] = _PathPattern(path)
+    by_tag = {}
+    for path, pattern in patterns.items():
+        by_tag.setdefault(pattern.tag, []).append((path, pattern))
+    return by_tag
+
+_PATTERNS_BY_TAG = _compile_specs(COLUMN_SPECS)
+
+def scan_elements(root: Element) -> dict:
+    """文書を1回だけ走査し、列定義のパスに最初に一致した要素を集めます。
+
+    戻り値のキーは (パス, sequence番号) で、sequence を持たないパスでは番号は None です。
+    一致する要素が複数ある場合は文書の順序で最初の要素を使います（lxml の _lxml_find と同じです）。
+    旧実装の findtext はパスの段ごとに探すため、入れ子の parties などでは値が異なります
+    （benchmarks/bench_extract.py の EDGE_CASES を参照してください）。
+    """
+    found = {}
+    ancestors = [root]
+    children = [iter(root)]
+    while children:
+        elem = next(children[-1], None)
+        if elem is None:
+            children.pop()
+            ancestors.pop()
+            continue
+        for path, pattern in _PATTERNS_BY_TAG.get(elem.tag, ()):
+            seq = pattern.match(elem, ancestors)
+            if seq is not False:
+                found.setdefault((path, seq), elem)
+        ancestors.append(elem)
+        children.append(iter(elem))
+    return found
+
+class _LimitedText(str):
+    """iterparse で FieldLimit を適用済みの本文です。extract_data で再び適用しないための印です。"""
+
+def _iterparse_xml(xml_file: Path, kinds: set, field_limit: Optional['FieldLimit'] = None) -> Optional[Element]:
+    """公開種別で早期に振り分けながらXMLを逐次解析します。
+
+    COMPACT_TAGS の要素は閉じた時点で整形済みの本文だけを残し、子要素を破棄します。
+    整形は冪等なため、extract_data の結果は通常の解析と変わりません。
+    field_limit を指定すると、本文を取り出す時点で切り詰めるか書き出すため、
+    上限を超える本文を1つの文字列にすることはありません。
+    """
+    if isinstance(xml_file, (str, Path)):
+        with open(xml_file, 'rb') as f:
+            return _iterparse_xml(f, kinds, field_limit)
+
+    source = _source_name(xml_file)
+    kind_checked = False
+    number = 'None'  # spill のファイル名に使う公開番号（extract_data の '公開番号' 列と同じ値）
+    context = iterparse(xml_file)
+    for _, elem in context:
+        if elem.tag == 'publication-reference' and not kind_checked:
+            kind = elem.findtext('document-id/kind')
+            if kind is None:
+                continue
+            if kind not in kinds:
+                return None
+            kind_checked = True
+            number = elem.findtext('document-id/doc-number', 'None')
+        elif elem.tag in COMPACT_TAGS:
+            if field_limit is None:
+                text = _joined_text(elem)
+            else:
+                name = _spill_name(number, COMPACT_COLUMNS[elem.tag], source)
+                text = _LimitedText(_limited_text(elem, field_limit, name))
+            del elem[:]
+            elem.text = text
+    return context.root if kind_checked else None
+
+# lxml エンジンで公開種別を取り出す XPath（名前空間とともに1回だけコンパイルします）
+_LXML_KIND = (lxml_etree.XPath('(.//publication-reference/document-id/kind)[1]', namespaces=NAMESPACES)
+              if lxml_etree is not None else None)
+
+# lxml のパーサはスレッド間で共有できないため、スレッドごとに作ります
+_lxml_local = threading.local()
+
+def _lxml_parser():
+    parser = getattr(_lxml_local, 'parser', None)
+    if parser is None:
+        # ElementTree と同じくコメントと処理命令は木に含めません。
+        # 本文が数MBになる公報もあるため、テキストノードの大きさの制限を外します。
+        parser = lxml_etree.XMLParser(remove_comments=True, remove_pis=True, huge_tree=True)
+        _lxml_local.parser = parser
+    return parser
+
+# 最初の publication-reference/document-id/kind をバイト列のまま読み取る正規表現（lxml エンジンの事前判定用）。
+# コメント・CDATA・文字参照を含む場合は一致させず、解析後の判定に任せます。
+_KIND_BYTES_RE = re.compile(rb'<publication-reference>\s*<document-id>(?:(?!</document-id>|<!)[^&])*?<kind>([^<&]*)</kind>',
+                            re.S)
+
+def _rejected_by_header(data: bytes, kinds: set) -> bool:
+    """解析せずに公開種別が kinds に含まれないと判定できれば True を返します。"""
+    start = data.find(b'<publication-reference')
+    if start < 0:
+        return False
+    match = _KIND_BYTES_RE.match(data, start)
+    if match is None:
+        return False
+    try:
+        return match.group(1).decode(declared_encoding(data[:256])) not in kinds
+    except (LookupError, UnicodeDecodeError):
+        return False
+
+def _lxml_parse(xml_file: Path, kinds: Optional[set]):
+    """lxml で文書全体を解析します。
+
+    C で実装されたパーサで一度に解析する方が iterparse で逐次処理するより速いため、
+    対象外の公開種別は解析の前にバイト列で判定し、判定できない文書は解析後に確認します。
+    EUC-JP もXML宣言に従って lxml がそのまま読めます。
+    """
+    if isinstance(xml_file, (str, Path)):
+        with open(xml_file, 'rb') as f:
+            data = f.read()
+    else:
+        data = xml_file.read()
+    if kinds is not None and _rejected_by_header(data, kinds):
+        return None
+    root = lxml_etree.fromstring(data, _lxml_parser())
+    if kinds is None:
+        return root
+    kind = _LXML_KIND(root)
+    if not kind or (kind[0].text or '') not in kinds:
+        return None
+    return root
+
+def _compile_xpaths(specs: list) -> list:
+    """列定義のパスを lxml の XPath にコンパイルします（名前空間は1回だけ束縛します）。
+
+    '{n}' の述語は sequence 属性の有無だけで照合し、出願人1〜12のような列をパスごとに
+    1回の評価でまとめて取り出します。戻り値は (パス, 一致した要素から sequence を持つ要素までの段数, XPath)
+    のリストで、sequence を持たないパスの段数は None です。
+    """
+    paths = []
+    for spec in specs:
+        for path in (spec.path, spec.guard):
+            if path and path != '.' and path not in paths:
+                paths.append(path)
+    compiled = []
+    for path in paths:
+        steps = path.split('/')
+        levels = next((len(steps) - 1 - i for i, step in enumerate(steps) if '{n}' in step), None)
+        compiled.append((path, levels, lxml_etree.XPath('.//' + path.replace('="{n}"', ''),
+                                                         namespaces=NAMESPACES)))
+    return compiled
+
+_LXML_XPATHS = _compile_xpaths(COLUMN_SPECS) if lxml_etree is not None else None
+
+def _lxml_find(root) -> dict:
+    """scan_elements と同じ形式で、列定義のパスに最初に一致した要素を XPath で集めます。"""
+    found = {}
+    for path, levels, xpath in _LXML_XPATHS:
+        for elem in xpath(root):
+            if levels is None:
+                found[(path, None)] = elem
+                break
+            node = elem
+            for _ in range(levels):
+                node = node.getparent()
+            found.setdefault((path, node.get('sequence')), elem)
+    return found
+
+# 大きな本文の扱い（spill: 別ファイルに書き出す, truncate: 切り詰める）
+OVERSIZED_MODES = ['spill', 'truncate']
+
+# spill で本文を書き出すディレクトリ（出力ディレクトリからの相対パス）と、列に出力する参照の接頭辞
+SPILL_DIR = 'fields'
+SPILL_PREFIX = 'file:'
+
+# 本文の列（FieldLimit の対象）の位置
+LONG_TEXT_COLUMNS = [i for i, spec in enumerate(COLUMN_SPECS) if spec.rule is _joined_text]
+
+# iterparse で本文を取り出す要素と、その列名（spill のファイル名に使います）
+COMPACT_COLUMNS = {spec.path: spec.name for spec in COLUMN_SPECS if spec.path in COMPACT_TAGS}
+
+# spill のファイル名に使えない文字（公開番号に含まれていても SPILL_DIR の外に書き込まないようにします）
+_UNSAFE_NAME_RE = re.compile(r'[\\/:*?"<>|\x00-\x1f]')
+
+def _source_name(xml_file) -> str:
+    """入力を区別する名前（パス、またはファイルオブジェクトの name）を返します。"""
+    return str(xml_file) if isinstance(xml_file, (str, Path)) else str(getattr(xml_file, 'name', ''))
+
+def _spill_name(number: str, column: str, source: str) -> str:
+    """spill で書き出すファイルの名前（拡張子なし）を返します。
+
+    公開番号が同じ文書や公開番号の無い文書が互いのファイルを上書きしないよう、
+    入力の名前（ファイルのパスまたはZIPのメンバー名）のハッシュを付けます。
+    """
+    digest = hashlib.sha1(source.encode('utf_8')).hexdigest()[:12]
+    return _UNSAFE_NAME_RE.sub('_', f"{number}_{column}_{digest}")
+
+class FieldLimit(NamedTuple):
+    """本文の列（_joined_text で整形する列）の大きさの上限です。
+
+    max_chars 文字を超える本文は、mode が 'truncate' なら先頭の max_chars 文字に切り詰め、
+    'spill' なら output_dir の SPILL_DIR に '公開番号_列名_入力のハッシュ.txt'（UTF-8、_spill_name）として書き出し、
+    列には SPILL_PREFIX に続けて output_dir からの相対パスを出力します。
+    本文は断片のまま数えて書き出すため、1つの文字列にするのは max_chars 文字までです。
+    """
+    max_chars: int
+    mode: str = 'spill'
+    output_dir: Optional[Path] = None
+
+def _limited_text(elem: Element, limit: FieldLimit, name: str) -> str:
+    if isinstance(elem.text, _LimitedText) and not len(elem):
+        # iterparse で適用済みの本文（切り詰めた本文か spill の参照）はそのまま使います
+        return str(elem.text)
+    pieces = _cleaned_pieces(elem, TEXT_SEPARATOR)
+    head = []
+    size = 0
+    for piece in pieces:
+        if size + len(piece) <= limit.max_chars:
+            head.append(piece)
+            size += len(piece)
+            continue
+        if limit.mode == 'truncate':
+            head.append(piece[:limit.max_chars - size])
+            logging.debug(f"'{name}' の本文を {limit.max_chars} 文字に切り詰めました。")
+            return ''.join(head)
+        relative = f"{SPILL_DIR}/{name}.txt"
+        spill_file = Path(limit.output_dir) / relative
+        spill_file.parent.mkdir(parents=True, exist_ok=True)
+        with spill_file.open('w', encoding='utf_8', newline='') as f:
+            f.writelines(head)
+            f.write(piece)
+            f.writelines(pieces)
+        logging.debug(f"'{name}' の本文を '{spill_file}' に書き出しました。")
+        return SPILL_PREFIX + relative
+    return ''.join(head)
+
+def make_field_limit(max_chars: Optional[int], mode: str, output_dir: Path) -> Optional[FieldLimit]:
+    """max_chars が指定されていれば FieldLimit を返します。"""
+    if max_chars is None:
+        return None
+    if mode not in OVERSIZED_MODES:
+        raise ValueError(f"大きな本文の扱い '{mode}' は指定できません。{OVERSIZED_MODES} から選んでください。")
+    if max_chars < 1:
+        raise ValueError("本文の上限は1文字以上を指定してください。")
+    return FieldLimit(max_chars, mode, Path(output_dir))
+
+def add_field_limit_arguments(parser: argparse.ArgumentParser):
+    """本文の大きさの上限を指定するCLIの引数を追加します。"""
+    parser.add_argument('--max-field-chars', type=int,
+                        help="本文の列の上限（文字数）。超えた本文は --oversized に従って扱う")
+    parser.add_argument('--oversized', choices=OVERSIZED_MODES, default='spill',
+                        help=f"上限を超えた本文の扱い（spill: 出力ディレクトリの {SPILL_DIR}/ に書き出して参照を出力, "
+                             "truncate: 切り詰める）")
+
+def add_conversion_arguments(parser: argparse.ArgumentParser, workers: bool = True, stats: bool = True):
+    """変換のCLIに共通の引数（--workers・--partition・--format・--engine・--stats）を追加します。
+
+    workers と stats に False を指定すると、その引数を追加しません（独自の並列度や進捗表示を持つCLI向け）。
+    """
+    if workers:
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help="解析に使うプロセス数（既定: CPUコア数）")
+    parser.add_argument('--partition', choices=list(PARTITIONS), default='number',
+                        help="出力ファイルの分け方（number: 公開番号, date: 公開日, month: 公開月, single: 1ファイル）")
+    parser.add_argument('--format', choices=FORMATS, default='csv',
+                        help="出力形式（parquet と arrow は pyarrow が必要です）")
+    parser.add_argument('--engine', choices=ENGINES, default=DEFAULT_ENGINE,
+                        help=f"解析エンジン（既定: {DEFAULT_ENGINE}。lxml は lxml のインストールが必要です）")
+    if stats:
+        parser.add_argument('--stats', action='store_true',
+                            help="進捗とスループットを標準エラー出力に表示し、最後に集計を表示する")
+
+def extract_data(elem: Element, field_limit: Optional[FieldLimit] = None, source: str = '') -> list:
+    """XML要素から必要なデータを抽出します。
+
+    COLUMN_SPECS の定義に従い、全列の値を作ります。
+    elem は ElementTree と lxml のどちらの要素でもかまいません（lxml の要素はコンパイル済みの XPath で探します）。
+    field_limit を指定すると、本文の列の大きさを FieldLimit に従って抑えます。
+    source は spill のファイル名に使う入力の名前（_spill_name）です。
+    """
+    if lxml_etree is not None and isinstance(elem, lxml_etree._Element):
+        found = _lxml_find(elem)
+    else:
+        found = scan_elements(elem)
+    found[('.', None)] = elem
+    list_in = []
+    for spec in COLUMN_SPECS:
+        seq = None if spec.seq is None else str(spec.seq)
+        if spec.guard is not None and (spec.guard, None) not in found:
+            list_in.append('None')
+            continue
+        target = found.get((spec.path, seq))
+        if target is None:
+            if spec.guard is not None:
+                # 従来どおり、Fタームがありテーマコードが無い文書はエラーとして扱います。
+                raise ValueError("テーマコードが見つかりません。")
+            list_in.append('None')
+        elif field_limit is not None and spec.rule is _joined_text:
+            list_in.append(_limited_text(target, field_limit, _spill_name(list_in[3], spec.name, source)))
+        else:
+            list_in.append(spec.rule(target))
+    return list_in
+
+
+def convert_file(xml_file: Path, stats: Optional[dict] = None, engine: Optional[str] = None,
+                 field_limit: Optional[FieldLimit] = None) -> Optional[list]:
+    """1つのXMLファイル（パスまたはファイルオブジェクト）を解析して行データを返します。
+    対象外の文書では空のリスト、エラー時は None を返します。
+
+    stats に辞書を渡すと、解析と抽出の処理時間（秒）を 'parse' と 'extract' に設定します。
+    engine は parse_xml、field_limit は extract_data と同じです。並列実行時はワーカープロセスで呼ばれます。
+    """
+    try:
+        start = time.perf_counter()
+        root = parse_xml(xml_file, TARGET_KINDS, engine, field_limit)
+        parsed = time.perf_counter()
+        data = extract_data(root, field_limit, _source_name(xml_file)) if root is not None else []
+        if stats is not None:
+            stats['parse'] = parsed - start
+            stats['extract'] = time.perf_counter() - parsed
+        return data
+    except Exception as e:
+        logging.error(f"ファイル '{xml_file.name}' の処理中にエラーが発生しました: {str(e)}")
+        return None
+
+def convert_file_with_stats(xml_file: Path, engine: Optional[str] = None,
+                            field_limit: Optional[FieldLimit] = None) -> tuple:
+    """convert_file の結果と処理時間を (行データ, stats) として返します。ワーカープロセスで実行されます。"""
+    stats = {}
+    return convert_file(xml_file, stats, engine, field_limit), stats
+
+def convert_file_with_fingerprint(xml_file: Path, engine: Optional[str] = None,
+                                  field_limit: Optional[FieldLimit] = None) -> tuple:
+    """convert_file_with_stats の結果に、変換したバイト列から作った Fingerprint を加えて返します。
+
+    マニフェストに記録する値を入力を読み直さずに得るため、ワーカープロセスで実行されます。
+    ファイルを開けない場合の Fingerprint は None です。
+    """
+    try:
+        reader = FingerprintReader(xml_file)
+    except OSError as e:
+        logging.error(f"ファイル '{xml_file.name}' を開けませんでした: {str(e)}")
+        return None, {}, None
+    with reader:
+        data, stats = convert_file_with_stats(reader, engine, field_limit)
+        return data, stats, reader.fingerprint()
+
+def record_conversion(name: str, size: int, data: Optional[list], stats: dict, done: int,
+                      total: Optional[int]):
+    """変換した1ファイルを METRICS の 'convert' 段階に記録し、進捗を通知します。
+
+    対象外の公開種別は 'convert.skipped_kind'、解析・抽出のエラーは 'convert.errors' に数えます。
+    """
+    METRICS.count('convert.files')
+    METRICS.count('convert.bytes_in', size)
+    if data is None:
+        METRICS.count('convert.errors')
+    elif not data:
+        METRICS.count('convert.skipped_kind')
+    else:
+        METRICS.count('convert.rows')
+        spilled = sum(data[i].startswith(SPILL_PREFIX) for i in LONG_TEXT_COLUMNS)
+        if spilled:
+            METRICS.count('convert.spilled_fields', spilled)
+    for stage, seconds in stats.items():
+        METRICS.observe(stage, seconds)
+    if stats:
+        METRICS.observe('convert', sum(stats.values()))
+    METRICS.progress('convert', done, total, name)
+
+def _convert_results(xml_files: list, workers: int, convert: Callable):
+    if workers <= 1:
+        yield from map(convert, xml_files)
+        return
+    chunksize = max(1, min(64, len(xml_files) // (workers * 4)))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        yield from executor.map(convert, xml_files, chunksize=chunksize)
+
+def _recorded_results(xml_files: list, workers: int, convert: Callable):
+    """convert の結果を入力と同じ順序で返し、呼び出し元のプロセスで METRICS に記録します。"""
+    results = _convert_results(xml_files, workers, convert)
+    for done, (xml_file, result) in enumerate(zip(xml_files, results), 1):
+        data, stats = result[:2]
+        record_conversion(xml_file.name, xml_file.stat().st_size, data, stats, done, len(xml_files))
+        yield result
+
+def iter_rows(xml_files: list, workers: int = 1, engine: Optional[str] = None,
+              field_limit: Optional[FieldLimit] = None):
+    """xml_files を順に変換した行データを、入力と同じ順序で返すジェネレータです。
+
+    workers が2以上ならプロセスプールで解析と抽出を並列に行い、
+    IPCの回数を減らすためファイルをまとめてワーカーに渡します。
+    各ファイルの結果と処理時間は呼び出し元のプロセスで METRICS に記録します。
+    """
+    convert = partial(convert_file_with_stats, engine=engine, field_limit=field_limit)
+    for data, _ in _recorded_results(xml_files, workers, convert):
+        yield data
+
+def _xml_to_csv_incremental(ipt_path: Path, opt_path: Path, xml_files: list, workers: int, partition: str,
+                            format: str, engine: str, field_limit: Optional[FieldLimit]):
+    """マニフェストに記録しながら、変換が必要なファイルだけを処理します。"""
+    with Manifest(ipt_path, opt_path) as manifest:
+        manifest.configure(partition, format)
+        manifest.recover()
+        todo = manifest.select(xml_files)
+        # サイズ・更新日時・SHA-256 はワーカーが変換したバイト列から計算したものを記録します
+        convert = partial(convert_file_with_fingerprint, engine=engine, field_limit=field_limit)
+        with open_sink(opt_path, COLUMNS, format, partition, journal=manifest) as sink:
+            for xml_file, (data, _, fingerprint) in zip(todo, _recorded_results(todo, workers, convert)):
+                if data is None:
+                    # 解析エラーのファイルは記録せず、次回も変換を試みます
+                    continue
+                if not data:
+                    manifest.add(xml_file, fingerprint, None, None)
+                    continue
+                # 行が flush された後に記録されるよう、書き込みより先に追加します
+                manifest.add(xml_file, fingerprint, sink.partition_key(data), data)
+                sink.write(data)
+
+def xml_to_csv(input_path: str, output_path: str, workers: Optional[int] = None,
+               partition: str = 'number', incremental: bool = False, format: str = 'csv',
+               sources: Optional[Iterable[str]] = None, engine: Optional[str] = None,
+               max_field_chars: Optional[int] = None, oversized: str = 'spill'):
+    """指定されたディレクトリ内のすべてのXMLファイルを処理し、CSVに変換します。
+
+    workers は解析に使うプロセス数で、省略時はCPUコア数です。
+    CSVへの書き込みは呼び出し元のプロセスだけが行い、行の順序は逐次処理と同じです。
+    partition は出力ファイルの分け方で、writer.PARTITIONS のいずれかを指定します。
+    incremental を指定すると出力ディレクトリのマニフェストを使い、変更のないファイルを
+    スキップし、変更されたファイルの行を置き換え、中断した変換の続きから再開します（CSVのみ）。
+    format は出力形式で、sinks.FORMATS のいずれかを指定します。
+    sources に入力ディレクトリからの相対パス（scanner.HeaderIndex.select の結果など）を
+    指定すると、それらのファイルだけを変換します。
+    engine は解析エンジン（ENGINES のいずれか）で、省略時は etree を使います。
+    max_field_chars を指定すると、それを超える本文を oversized（OVERSIZED_MODES のいずれか）に従って
+    出力ディレクトリの fields/ に書き出すか切り詰めます（FieldLimit）。
+    ファイル数・対象外の件数・エラー数・処理時間は metrics.METRICS の 'convert' 段階に記録し、
+    最後に集計をログに出力します。
+    ファイルごとのエラーはログに記録して続けますが、処理全体が失敗した場合（引数の誤りや
+    出力先への書き込みの失敗など）はログに記録してから例外を送出します。
+    """
+    try:
+        if incremental and format != 'csv':
+            raise ValueError("差分変換（マニフェスト）は CSV 出力でのみ使用できます。")
+        engine = resolve_engine(engine)
+        ipt_path, opt_path = setup_paths(input_path, output_path)
+        field_limit = make_field_limit(max_field_chars, oversized, opt_path)
+        if sources is None:
+            xml_files = list(ipt_path.glob('**/*.xml'))
+        else:
+            xml_files = [ipt_path / source for source in sources]
+
+        if not xml_files:
+            logging.warning(f"入力ディレクトリ '{input_path}' にXMLファイルが見つかりません。")
+            return
+
+        if workers is None:
+            workers = os.cpu_count() or 1
+
+        with METRICS.stage('convert'):
+            if incremental:
+                _xml_to_csv_incremental(ipt_path, opt_path, xml_files, workers, partition, format, engine,
+                                        field_limit)
+            else:
+                with open_sink(opt_path, COLUMNS, format, partition) as sink:
+                    for data in iter_rows(xml_files, workers, engine, field_limit):
+                        if data:
+                            sink.write(data)
+
+        logging.info(f"すべてのXMLファイルの処理が完了しました。処理されたファイル数: {len(xml_files)}")
+        for stage in ('convert', 'parse', 'extract', 'write'):
+            METRICS.log_summary(stage)
+    except Exception as e:
+        logging.error(f"処理中に予期しないエラーが発生しました: {str(e)}")
+        raise
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="XMLファイルをCSVに変換します。")
+    parser.add_argument('input_dir', help="入力ディレクトリ")
+    parser.add_argument('output_dir', help="出力ディレクトリ")
+    add_conversion_arguments(parser)
+    parser.add_argument('--incremental', action='store_true',
+                        help="マニフェストを使い、変更のないファイルをスキップして中断箇所から再開する")
+    add_field_limit_arguments(parser)
+    add_selection_arguments(parser)
+    parser.add_argument('--not-converted', action='store_true',
+                        help="出力ディレクトリのマニフェストに記録済みの文書を除く（--incremental で作成したもの）")
+    args = parser.parse_args()
+
+    with console_stats() if args.stats else contextlib.nullcontext():
+        # --kind・--month・--not-converted は書誌事項のインデックスで入力を絞り込みます
+        sources = select_sources(args.input_dir, args.output_dir, args.kind, args.month,
+                                 args.output_dir if args.not_converted else None)
+        xml_to_csv(args.input_dir, args.output_dir, workers=args.workers, partition=args.partition,
+                   incremental=args.incremental, format=args.format, sources=sources, engine=args.engine,
+                   max_field_chars=args.max_field_chars, oversized=args.oversized)
\ No newline at end of file
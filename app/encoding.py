@@ -1,68 +1,180 @@
-import shutil
-import os
-import codecs
-import logging
-from pathlib import Path
-
-# ログの設定
-logging.basicConfig(filename='encoding_conversion.log', level=logging.INFO,
-                    format='%(asctime)s - %(levelname)s - %(message)s')
-
-def setup_paths(input_path: str, output_path: str) -> tuple:
-    """入力と出力のパスをPath objectsとして設定し、検証します。"""
-    ipt_path = Path(input_path)
-    opt_path = Path(output_path)
-
-    if not ipt_path.exists():
-        raise FileNotFoundError(f"入力パス '{input_path}' が見つかりません。")
-    if not opt_path.exists():
-        opt_path.mkdir(parents=True, exist_ok=True)
-        logging.info(f"出力ディレクトリ '{output_path}' を作成しました。")
-
-    return ipt_path, opt_path
-
-def copy_and_convert_encoding(input_file: Path, output_file: Path):
-    """XMLファイルをコピーし、エンコーディングをEUC-JPからUTF-8に変換します。"""
-    try:
-        with open(input_file, 'r', encoding='euc_jp') as f_in, \
-             open(output_file, 'w', encoding='utf_8') as f_out:
-            content = f_in.read()
-            converted_content = content.replace(
-                '<?xml version="1.0" encoding="EUC-JP"?>',
-                '<?xml version="1.0" encoding="UTF-8"?>'
-            )
-            f_out.write(converted_content)
-        logging.info(f"ファイル '{input_file.name}' を変換しました。")
-    except UnicodeDecodeError:
-        logging.error(f"ファイル '{input_file.name}' のデコードに失敗しました。EUC-JPではない可能性があります。")
-    except Exception as e:
-        logging.error(f"ファイル '{input_file.name}' の処理中にエラーが発生しました: {str(e)}")
-
-def copy_xml_and_chg_ipt_codec(input_path: str, output_path: str):
-    """指定されたディレクトリ内のすべてのXMLファイルを処理します。"""
-    try:
-        ipt_path, opt_path = setup_paths(input_path, output_path)
-        xml_files = list(ipt_path.glob('**/*.xml'))
-        
-        if not xml_files:
-            logging.warning(f"入力ディレクトリ '{input_path}' にXMLファイルが見つかりません。")
-            return
-
-        for xml_file in xml_files:
-            relative_path = xml_file.relative_to(ipt_path)
-            output_file = opt_path / relative_path
-            output_file.parent.mkdir(parents=True, exist_ok=True)
-            copy_and_convert_encoding(xml_file, output_file)
-
-        logging.info(f"すべてのXMLファイルの処理が完了しました。処理されたファイル数: {len(xml_files)}")
-    except Exception as e:
-        logging.error(f"処理中に予期しないエラーが発生しました: {str(e)}")
-
-if __name__ == "__main__":
-    import sys
-    if len(sys.argv) != 3:
-        print("使用方法: python encoding.py <入力ディレクトリ> <出力ディレクトリ>")
-        sys.exit(1)
-    
-    input_dir, output_dir = sys.argv[1], sys.argv[2]
-    copy_xml_and_chg_ipt_codec(input_dir, output_dir)
\ No newline at end of file
+import io
+import re
+import shutil
+import os
+import time
+import codecs
+import logging
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional
+from metrics import METRICS, console_stats, setup_logging
+
+setup_logging('encoding_conversion.log')
+
+def setup_paths(input_path: str, output_path: str) -> tuple:
+    """入力と出力のパスをPath objectsとして設定し、検証します。"""
+    ipt_path = Path(input_path)
+    opt_path = Path(output_path)
+
+    if not ipt_path.exists():
+        raise FileNotFoundError(f"入力パス '{input_path}' が見つかりません。")
+    if not opt_path.exists():
+        opt_path.mkdir(parents=True, exist_ok=True)
+        logging.info(f"出力ディレクトリ '{output_path}' を作成しました。")
+
+    return ipt_path, opt_path
+
+# 変換時に一度に読み込むバイト数
+CHUNK_SIZE = 64 * 1024
+
+EUC_JP_DECLARATION = '<?xml version="1.0" encoding="EUC-JP"?>'
+UTF_8_DECLARATION = '<?xml version="1.0" encoding="UTF-8"?>'
+
+def copy_and_convert_encoding(input_file: Path, output_file: Path, chunk_size: int = CHUNK_SIZE):
+    """XMLファイルをコピーし、エンコーディングをEUC-JPからUTF-8に変換します。
+
+    ファイル全体を読み込まず、chunk_size ごとにインクリメンタルデコーダで変換します。
+    チャンクの境界で分かれたマルチバイト文字はデコーダが次のチャンクとつなげて扱います。
+    XML宣言の書き換えはファイル先頭の宣言だけに行います。
+    成功すれば True、失敗した場合は書きかけの出力を削除して False を返します。
+    """
+    decoder = codecs.getincrementaldecoder('euc_jp')()
+    try:
+        with open(input_file, 'rb') as f_in, open(output_file, 'wb') as f_out:
+            prolog = ''
+            while True:
+                chunk = f_in.read(chunk_size)
+                text = decoder.decode(chunk, final=not chunk)
+                if prolog is not None:
+                    # 宣言全体がそろうまで先頭をためてから書き換えます
+                    prolog += text
+                    if len(prolog) < len(EUC_JP_DECLARATION) and chunk:
+                        continue
+                    if prolog.startswith(EUC_JP_DECLARATION):
+                        prolog = UTF_8_DECLARATION + prolog[len(EUC_JP_DECLARATION):]
+                    text, prolog = prolog, None
+                f_out.write(text.encode('utf_8'))
+                if not chunk:
+                    break
+        logging.debug(f"ファイル '{input_file.name}' を変換しました。")
+        return True
+    except UnicodeDecodeError:
+        logging.error(f"ファイル '{input_file.name}' のデコードに失敗しました。EUC-JPではない可能性があります。")
+        _remove_partial(output_file)
+    except Exception as e:
+        logging.error(f"ファイル '{input_file.name}' の処理中にエラーが発生しました: {str(e)}")
+        _remove_partial(output_file)
+    return False
+
+def _remove_partial(output_file: Path):
+    """変換に失敗したときの書きかけの出力を削除します。"""
+    try:
+        os.remove(output_file)
+    except OSError:
+        pass
+
+def _convert_pair(pair: tuple) -> tuple:
+    """1ファイルを変換し、(成功したか, 入力バイト数, 出力バイト数, 処理時間) を返します。"""
+    input_file, output_file = pair
+    start = time.perf_counter()
+    ok = copy_and_convert_encoding(input_file, output_file)
+    seconds = time.perf_counter() - start
+    return ok, input_file.stat().st_size, output_file.stat().st_size if ok else 0, seconds
+
+def _record_pair(pair: tuple, result: tuple, done: int, total: int):
+    """変換した1ファイルを METRICS に記録し、進捗を通知します。"""
+    ok, bytes_in, bytes_out, seconds = result
+    METRICS.count('transcode.files')
+    METRICS.count('transcode.bytes_in', bytes_in)
+    METRICS.count('transcode.bytes_out', bytes_out)
+    if not ok:
+        METRICS.count('transcode.errors')
+    METRICS.observe('transcode', seconds)
+    METRICS.progress('transcode', done, total, pair[0].name)
+
+_ENCODING_DECL_RE = re.compile(rb'<\?xml[^>]*?encoding\s*=\s*["\']([A-Za-z0-9._-]+)["\']')
+
+# expat がそのまま読めるエンコーディング
+_NATIVE_ENCODINGS = {'utf-8', 'utf8', 'us-ascii', 'ascii'}
+
+def declared_encoding(head: bytes) -> str:
+    """XML宣言で指定されたエンコーディング名を返します。宣言が無ければ 'utf-8' を返します。"""
+    match = _ENCODING_DECL_RE.match(head.lstrip(b'\xef\xbb\xbf'))
+    return match.group(1).decode('ascii').lower() if match else 'utf-8'
+
+def open_xml_stream(raw: io.BufferedIOBase):
+    """XMLのバイトストリームを、ElementTree でそのまま解析できるストリームにして返します。
+
+    EUC-JP など expat が扱えないエンコーディングの場合は TextIOWrapper で逐次デコードします。
+    raw はシーク可能である必要があります。
+    """
+    head = raw.read(256)
+    raw.seek(0)
+    encoding = declared_encoding(head)
+    if encoding in _NATIVE_ENCODINGS:
+        return raw
+    return io.TextIOWrapper(raw, encoding=encoding)
+
+def copy_xml_and_chg_ipt_codec(input_path: str, output_path: str, workers: Optional[int] = None,
+                               pool: str = 'process'):
+    """指定されたディレクトリ内のすべてのXMLファイルを処理します。
+
+    workers は並列に変換するファイル数で、省略時はCPUコア数です。
+    pool には 'process'（プロセスプール）か 'thread'（スレッドプール）を指定します。
+    ファイル数・バイト数・処理時間は metrics.METRICS の 'transcode' 段階に記録し、
+    ログにはファイルごとではなく最後に集計を1行だけ出力します。
+    ファイルごとのエラーはログに記録して続けますが、処理全体が失敗した場合は
+    ログに記録してから例外を送出します（extract_zip と同じです）。
+    """
+    try:
+        ipt_path, opt_path = setup_paths(input_path, output_path)
+        xml_files = list(ipt_path.glob('**/*.xml'))
+        
+        if not xml_files:
+            logging.warning(f"入力ディレクトリ '{input_path}' にXMLファイルが見つかりません。")
+            return
+
+        pairs = []
+        for xml_file in xml_files:
+            relative_path = xml_file.relative_to(ipt_path)
+            output_file = opt_path / relative_path
+            output_file.parent.mkdir(parents=True, exist_ok=True)
+            pairs.append((xml_file, output_file))
+
+        if workers is None:
+            workers = os.cpu_count() or 1
+        with METRICS.stage('transcode'):
+            if workers <= 1:
+                for done, pair in enumerate(pairs, 1):
+                    _record_pair(pair, _convert_pair(pair), done, len(pairs))
+            else:
+                executor_class = ThreadPoolExecutor if pool == 'thread' else ProcessPoolExecutor
+                chunksize = max(1, min(64, len(pairs) // (workers * 4)))
+                with executor_class(max_workers=workers) as executor:
+                    results = executor.map(_convert_pair, pairs, chunksize=chunksize)
+                    for done, (pair, result) in enumerate(zip(pairs, results), 1):
+                        _record_pair(pair, result, done, len(pairs))
+
+        logging.info(f"すべてのXMLファイルの処理が完了しました。処理されたファイル数: {len(xml_files)}")
+        METRICS.log_summary('transcode')
+    except Exception as e:
+        logging.error(f"処理中に予期しないエラーが発生しました: {str(e)}")
+        raise
+
+if __name__ == "__main__":
+    import argparse
+    import contextlib
+    parser = argparse.ArgumentParser(description="XMLファイルのエンコーディングをEUC-JPからUTF-8に変換します。")
+    parser.add_argument('input_dir', help="入力ディレクトリ")
+    parser.add_argument('output_dir', help="出力ディレクトリ")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help="並列に変換するファイル数（既定: CPUコア数）")
+    parser.add_argument('--pool', choices=['process', 'thread'], default='process',
+                        help="並列化の方法（既定: process）")
+    parser.add_argument('--stats', action='store_true',
+                        help="進捗とスループットを標準エラー出力に表示し、最後に集計を表示する")
+    args = parser.parse_args()
+
+    with console_stats() if args.stats else contextlib.nullcontext():
+        copy_xml_and_chg_ipt_codec(args.input_dir, args.output_dir, workers=args.workers, pool=args.pool)
\ No newline at end of file
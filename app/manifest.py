@@ -0,0 +1,249 @@
+import os
+import csv
+import hashlib
+import logging
+import sqlite3
+from pathlib import Path
+from typing import NamedTuple
+
+# 出力ディレクトリに作成するマニフェストのファイル名
+MANIFEST_NAME = 'conversion_manifest.sqlite3'
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS sources (
+    path TEXT PRIMARY KEY,   -- 入力ディレクトリからの相対パス
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    sha256 TEXT NOT NULL,
+    csv_name TEXT,           -- 出力先のCSV（対象外の文書は NULL）
+    row_digest TEXT          -- 出力した行のダイジェスト
+);
+CREATE TABLE IF NOT EXISTS outputs (
+    csv_name TEXT PRIMARY KEY,
+    committed_size INTEGER NOT NULL  -- マニフェストに記録済みの行だけを含むファイルサイズ
+);
+CREATE TABLE IF NOT EXISTS settings (
+    key TEXT PRIMARY KEY,    -- 出力の設定（partition・format）
+    value TEXT NOT NULL
+);
+'''
+
+def file_sha256(path: Path) -> str:
+    """ファイル内容のSHA-256を返します。"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class Fingerprint(NamedTuple):
+    """変換したときの入力ファイルのサイズ・更新日時・SHA-256 です。"""
+    size: int
+    mtime_ns: int
+    sha256: str
+
+class FingerprintReader:
+    """ファイルを読みながら、読んだバイト列から Fingerprint を作ります。
+
+    変換に使うファイルオブジェクトとしてそのまま渡せます。ワーカープロセスで変換と同時に
+    計算するため、入力を読み直す必要がなく、変換中にファイルが変わっても記録は
+    変換した内容と一致します（更新日時は開いた時点の値です）。
+    """
+
+    def __init__(self, path: Path):
+        self.name = str(path)
+        self._file = open(path, 'rb')
+        self._mtime_ns = os.fstat(self._file.fileno()).st_mtime_ns
+        self._digest = hashlib.sha256()
+        self._size = 0
+
+    def read(self, size: int = -1) -> bytes:
+        data = self._file.read(size)
+        self._digest.update(data)
+        self._size += len(data)
+        return data
+
+    def fingerprint(self) -> Fingerprint:
+        """残りを読み切って Fingerprint を返します（公開種別で解析を打ち切った場合も全体の値になります）。"""
+        for _ in iter(lambda: self.read(1024 * 1024), b''):
+            pass
+        return Fingerprint(self._size, self._mtime_ns, self._digest.hexdigest())
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+def row_digest(row: list) -> str:
+    """行データのダイジェストを返します。"""
+    return hashlib.sha1('\x1f'.join(row).encode('utf_8')).hexdigest()
+
+class Manifest:
+    """入力ファイルごとの変換結果を出力ディレクトリの SQLite に記録します。
+
+    CsvWriterPool の journal として使うと、CSVへの書き込みとマニフェストの更新を
+    flush 単位でそろえます。中断した場合は次回の recover で、マニフェストに
+    記録されていない書きかけの行をCSVから取り除きます。
+    """
+
+    def __init__(self, input_dir: Path, output_dir: Path, encoding: str = 'cp932'):
+        self.input_dir = Path(input_dir)
+        self.output_dir = Path(output_dir)
+        self.encoding = encoding
+        self._conn = sqlite3.connect(self.output_dir / MANIFEST_NAME)
+        self._conn.executescript(_SCHEMA)
+        self._pending = []
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _csv_path(self, csv_name: str) -> Path:
+        return self.output_dir / f"{csv_name}.csv"
+
+    def configure(self, partition: str, format: str = 'csv'):
+        """出力の分け方と形式を記録します。
+
+        記録と異なる場合（設定を記録していない古いマニフェストを含みます）は、記録済みのCSVを削除して
+        マニフェストを空にし、すべての入力を変換し直します。以前の設定の出力だけが残ったまま、
+        変更のない入力がスキップされることはありません。
+        """
+        settings = {'partition': partition, 'format': format}
+        stored = dict(self._conn.execute('SELECT key, value FROM settings'))
+        if stored == settings:
+            return
+        outputs = [csv_name for csv_name, in self._conn.execute('SELECT csv_name FROM outputs')]
+        has_sources = self._conn.execute('SELECT 1 FROM sources LIMIT 1').fetchone() is not None
+        with self._conn:
+            if outputs or has_sources:
+                logging.warning(f"出力の設定が前回（{stored or '記録なし'}）と異なるため、"
+                                f"{len(outputs)} 件のCSVを削除してすべての入力を変換し直します。")
+                for csv_name in outputs:
+                    self._csv_path(csv_name).unlink(missing_ok=True)
+                self._conn.execute('DELETE FROM sources')
+                self._conn.execute('DELETE FROM outputs')
+            self._conn.execute('DELETE FROM settings')
+            self._conn.executemany('INSERT INTO settings VALUES (?, ?)', settings.items())
+
+    def recover(self):
+        """前回の中断で残った、マニフェストに記録されていない行をCSVから取り除きます。"""
+        outputs = self._conn.execute('SELECT csv_name, committed_size FROM outputs').fetchall()
+        with self._conn:
+            for csv_name, committed_size in outputs:
+                path = self._csv_path(csv_name)
+                if not path.exists():
+                    # CSVが削除されている場合は、そのCSVに出力した入力を次回作り直します
+                    logging.warning(f"CSVファイル '{path.name}' が見つからないため、対応する入力を再変換します。")
+                    self._conn.execute('DELETE FROM sources WHERE csv_name = ?', (csv_name,))
+                    self._conn.execute('DELETE FROM outputs WHERE csv_name = ?', (csv_name,))
+                    continue
+                size = path.stat().st_size
+                if size > committed_size:
+                    with open(path, 'r+b') as f:
+                        f.truncate(committed_size)
+                    logging.info(f"CSVファイル '{path.name}' から中断時の書きかけの行を取り除きました。")
+                elif size < committed_size:
+                    logging.warning(f"CSVファイル '{path.name}' がマニフェストの記録より小さくなっています。")
+                    self._conn.execute('UPDATE outputs SET committed_size = ? WHERE csv_name = ?',
+                                       (size, csv_name))
+
+    def select(self, xml_files: list) -> list:
+        """変換が必要なファイルを返します。
+
+        サイズと更新日時が記録と同じファイルは変更なしとみなします。異なる場合は内容の
+        SHA-256 を比較し、変更があったファイルは以前に出力した行をCSVから取り除きます。
+        """
+        records = {path: (size, mtime_ns, sha256, csv_name, digest)
+                   for path, size, mtime_ns, sha256, csv_name, digest
+                   in self._conn.execute('SELECT * FROM sources')}
+        todo = []
+        stale = {}
+        changed = 0
+        with self._conn:
+            for xml_file in xml_files:
+                key = self._key(xml_file)
+                record = records.get(key)
+                if record is None:
+                    todo.append(xml_file)
+                    continue
+                stat = xml_file.stat()
+                size, mtime_ns, sha256, csv_name, digest = record
+                if (stat.st_size, stat.st_mtime_ns) == (size, mtime_ns):
+                    continue
+                if file_sha256(xml_file) == sha256:
+                    self._conn.execute('UPDATE sources SET size = ?, mtime_ns = ? WHERE path = ?',
+                                       (stat.st_size, stat.st_mtime_ns, key))
+                    continue
+                changed += 1
+                if csv_name is not None:
+                    stale.setdefault(csv_name, []).append(digest)
+                self._conn.execute('DELETE FROM sources WHERE path = ?', (key,))
+                todo.append(xml_file)
+            for csv_name, digests in stale.items():
+                self._remove_rows(csv_name, digests)
+        skipped = len(xml_files) - len(todo)
+        logging.info(f"マニフェストにより {skipped} 件の変更のないファイルをスキップします。"
+                     f"（変更: {changed} 件）")
+        return todo
+
+    def _remove_rows(self, csv_name: str, digests: list):
+        """CSVから指定したダイジェストの行を1行ずつ取り除きます。"""
+        path = self._csv_path(csv_name)
+        if not path.exists():
+            return
+        remaining = list(digests)
+        tmp_path = path.with_name(path.name + '.tmp')
+        with path.open('r', newline='', encoding=self.encoding) as f_in, \
+             tmp_path.open('w', newline='', encoding=self.encoding) as f_out:
+            writer = csv.writer(f_out, lineterminator='\n')
+            for row in csv.reader(f_in):
+                digest = row_digest(row)
+                if digest in remaining:
+                    remaining.remove(digest)
+                else:
+                    writer.writerow(row)
+        os.replace(tmp_path, path)
+        self._conn.execute('INSERT OR REPLACE INTO outputs VALUES (?, ?)', (csv_name, path.stat().st_size))
+
+    def _key(self, xml_file: Path) -> str:
+        return xml_file.relative_to(self.input_dir).as_posix()
+
+    def add(self, xml_file: Path, fingerprint: Fingerprint, csv_name, row):
+        """変換結果を記録待ちに追加します。行は次の flush で書き込まれた後に記録されます。
+
+        fingerprint には変換したバイト列から作った値（FingerprintReader）を渡します。
+        """
+        self._pending.append((xml_file, fingerprint, csv_name, row))
+
+    # 以下は CsvWriterPool から呼ばれます
+
+    def prepare(self, csv_names):
+        """書き込み前に、新しいCSVの記録済みサイズを現在のサイズで登録します。"""
+        with self._conn:
+            for csv_name in csv_names:
+                path = self._csv_path(csv_name)
+                size = path.stat().st_size if path.exists() else 0
+                self._conn.execute('INSERT OR IGNORE INTO outputs VALUES (?, ?)', (csv_name, size))
+
+    def commit(self, sizes: dict, failed_rows: list = ()):
+        """書き込みが終わった行の入力を記録し、CSVの記録済みサイズを更新します。"""
+        failed = {id(row) for row in failed_rows}
+        with self._conn:
+            for xml_file, fingerprint, csv_name, row in self._pending:
+                if row is not None and id(row) in failed:
+                    continue
+                self._conn.execute(
+                    'INSERT OR REPLACE INTO sources VALUES (?, ?, ?, ?, ?, ?)',
+                    (self._key(xml_file), *fingerprint, csv_name, None if row is None else row_digest(row)))
+            for csv_name, size in sizes.items():
+                self._conn.execute('UPDATE outputs SET committed_size = ? WHERE csv_name = ?', (size, csv_name))
+        self._pending.clear()
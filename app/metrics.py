@@ -0,0 +1,220 @@
+import sys
+import time
+import queue
+import bisect
+import logging
+import threading
+from contextlib import contextmanager
+from typing import NamedTuple, Optional
+
+# ログの書式
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+def setup_logging(filename: str):
+    """ログの出力先を設定します。
+
+    logging.basicConfig は最初の呼び出しだけが有効なため、CLIのモジュールは
+    ほかの app のモジュールを import する前に呼び出し、自分のログファイルを使います。
+    """
+    logging.basicConfig(filename=filename, level=logging.INFO, format=LOG_FORMAT)
+
+# 処理時間ヒストグラムの区切り（ミリ秒）
+LATENCY_BUCKETS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000]
+
+class ProgressEvent(NamedTuple):
+    """1ファイル（またはZIPのメンバー）の処理が終わるたびに通知される進捗です。"""
+    stage: str
+    done: int
+    total: Optional[int]
+    name: str
+
+class Histogram:
+    """処理時間のヒストグラムです。LATENCY_BUCKETS_MS の区切りごとに件数を数えます。"""
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float):
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS_MS, seconds * 1000)] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def to_dict(self) -> dict:
+        labels = [f"<={bound}ms" for bound in LATENCY_BUCKETS_MS] + [f">{LATENCY_BUCKETS_MS[-1]}ms"]
+        return {
+            'count': self.count,
+            'mean_ms': round(self.total / self.count * 1000, 3) if self.count else None,
+            'max_ms': round(self.max * 1000, 3),
+            'buckets': {label: n for label, n in zip(labels, self.counts) if n},
+        }
+
+class Metrics:
+    """unzip・encoding・convert などの段階で共有するカウンタと処理時間の集計です。
+
+    カウンタ名は '段階.項目'（例: 'convert.skipped_kind'）とします。progress で通知した進捗は、
+    subscribe で受け取ったキューに届きます（購読者がいなければ捨てられます）。
+    すべてのメソッドはスレッドセーフです。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = []
+        self.reset()
+
+    def reset(self):
+        """集計を初期化します。購読は維持されます。"""
+        with self._lock:
+            self.counters = {}
+            self.histograms = {}
+            self.elapsed = {}
+            self._running = {}
+
+    def count(self, name: str, n: int = 1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def observe(self, stage: str, seconds: float):
+        """段階の1件あたりの処理時間を記録します。"""
+        with self._lock:
+            self.histograms.setdefault(stage, Histogram()).observe(seconds)
+
+    @contextmanager
+    def timer(self, stage: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    @contextmanager
+    def stage(self, stage: str):
+        """段階全体の経過時間を記録します（スループットの計算に使います）。"""
+        start = time.perf_counter()
+        with self._lock:
+            self._running[stage] = start
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.elapsed[stage] = self.elapsed.get(stage, 0.0) + time.perf_counter() - start
+                self._running.pop(stage, None)
+
+    def throughput(self, stage: str) -> tuple:
+        """段階の (files/s, MB/s) を返します。実行中の段階は現在までの値を返します。"""
+        with self._lock:
+            seconds = self.elapsed.get(stage, 0.0)
+            if stage in self._running:
+                seconds += time.perf_counter() - self._running[stage]
+            files = self.counters.get(f'{stage}.files', 0)
+            bytes_in = self.counters.get(f'{stage}.bytes_in', 0)
+        if not seconds:
+            return None, None
+        return files / seconds, bytes_in / 1024 / 1024 / seconds
+
+    def subscribe(self) -> queue.Queue:
+        """進捗イベントを受け取るキューを返します。"""
+        events = queue.Queue()
+        with self._lock:
+            self._subscribers.append(events)
+        return events
+
+    def unsubscribe(self, events: queue.Queue):
+        with self._lock:
+            if events in self._subscribers:
+                self._subscribers.remove(events)
+
+    def progress(self, stage: str, done: int, total: Optional[int], name: str):
+        """1件の処理が終わったことを購読者に通知します。"""
+        with self._lock:
+            subscribers = list(self._subscribers)
+        if subscribers:
+            event = ProgressEvent(stage, done, total, name)
+            for events in subscribers:
+                events.put(event)
+
+    def stages(self) -> list:
+        """集計のある段階の名前を、最初に記録された順に返します。"""
+        with self._lock:
+            names = [name.split('.', 1)[0] for name in self.counters]
+            names += list(self.elapsed) + list(self.histograms)
+        return list(dict.fromkeys(names))
+
+    def snapshot(self) -> dict:
+        """現在の集計を辞書で返します。"""
+        stages = {}
+        for stage in self.stages():
+            files_per_s, mb_per_s = self.throughput(stage)
+            stages[stage] = {
+                'seconds': round(self.elapsed.get(stage, 0.0), 3),
+                'files_per_s': None if files_per_s is None else round(files_per_s, 1),
+                'mb_per_s': None if mb_per_s is None else round(mb_per_s, 2),
+            }
+        with self._lock:
+            return {
+                'counters': dict(self.counters),
+                'stages': stages,
+                'latency': {stage: histogram.to_dict() for stage, histogram in self.histograms.items()},
+            }
+
+    def summary(self, stage: str) -> str:
+        """段階の集計を1行の文字列にまとめます。"""
+        prefix = f'{stage}.'
+        with self._lock:
+            counters = sorted((name[len(prefix):], value) for name, value in self.counters.items()
+                              if name.startswith(prefix))
+            histogram = self.histograms.get(stage)
+            latency = histogram.to_dict() if histogram is not None else None
+        parts = [', '.join(f"{name}={value}" for name, value in counters)]
+        files_per_s, mb_per_s = self.throughput(stage)
+        if files_per_s is not None:
+            parts.append(f"{self.elapsed.get(stage, 0.0):.2f}s, {files_per_s:.1f} files/s, {mb_per_s:.2f} MB/s")
+        if latency is not None:
+            parts.append(f"mean {latency['mean_ms']}ms, max {latency['max_ms']}ms (n={latency['count']})")
+        return f"[{stage}] " + '; '.join(part for part in parts if part)
+
+    def log_summary(self, stage: str):
+        logging.info(self.summary(stage))
+
+# アプリケーション全体で共有する集計
+METRICS = Metrics()
+
+@contextmanager
+def console_stats(metrics: Metrics = METRICS, interval: float = 1.0, stream=sys.stderr):
+    """CLIの --stats 用に、進捗とスループットを定期的に表示し、終了時に集計を表示します。"""
+    events = metrics.subscribe()
+    stop = threading.Event()
+
+    def report():
+        # 進捗は interval ごとに最新の1件だけを表示します
+        while not stop.is_set():
+            stop.wait(interval)
+            last = None
+            while True:
+                try:
+                    last = events.get_nowait()
+                except queue.Empty:
+                    break
+            if last is not None:
+                print(format_progress(metrics, last), file=stream, flush=True)
+
+    thread = threading.Thread(target=report, daemon=True)
+    thread.start()
+    try:
+        yield metrics
+    finally:
+        stop.set()
+        thread.join()
+        metrics.unsubscribe(events)
+        for stage in metrics.stages():
+            print(metrics.summary(stage), file=stream)
+
+def format_progress(metrics: Metrics, event: ProgressEvent) -> str:
+    """進捗イベントを '[段階] 完了数/全体数 files, files/s, MB/s' の形式にします。"""
+    total = f"/{event.total}" if event.total else ''
+    files_per_s, mb_per_s = metrics.throughput(event.stage)
+    rate = f", {files_per_s:.1f} files/s, {mb_per_s:.2f} MB/s" if files_per_s is not None else ''
+    return f"[{event.stage}] {event.done}{total} files{rate}"
@@ -0,0 +1,156 @@
+import io
+import os
+import logging
+import zipfile
+import argparse
+import contextlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Iterable, Optional
+
+from metrics import setup_logging
+setup_logging('zip_to_csv_pipeline.log')
+
+from unzip import iter_xml_members
+from encoding import open_xml_stream
+from convert import (COLUMNS, FieldLimit, add_conversion_arguments, add_field_limit_arguments, convert_file,
+                     make_field_limit, record_conversion, resolve_engine)
+from sinks import open_sink
+from metrics import METRICS, console_stats
+from scanner import add_selection_arguments, select_sources
+
+# ワーカーに一度に渡すXMLの件数
+BATCH_SIZE = 32
+
+def convert_member(name: str, data: bytes, stats: Optional[dict] = None,
+                   engine: Optional[str] = None, field_limit: Optional[FieldLimit] = None) -> Optional[list]:
+    """ZIPから読み出したXMLの内容を解析して行データを返します。
+
+    対象外の文書では空のリスト、エラー時は None を返します。stats・engine・field_limit は convert_file と同じです。
+    """
+    raw = io.BytesIO(data)
+    raw.name = name
+    engine = resolve_engine(engine)
+    # lxml は EUC-JP をそのまま解析できるため、デコード用のラッパーは etree のときだけ使います
+    stream = raw if engine == 'lxml' else open_xml_stream(raw)
+    return convert_file(stream, stats, engine, field_limit)
+
+def _convert_member_with_stats(name: str, data: bytes, engine: Optional[str],
+                               field_limit: Optional[FieldLimit]) -> tuple:
+    stats = {}
+    return convert_member(name, data, stats, engine, field_limit), stats
+
+def convert_batch(batch: list, engine: Optional[str] = None, field_limit: Optional[FieldLimit] = None) -> list:
+    """(メンバーのパス, 内容) のリストをまとめて変換し、(行データ, stats) のリストを返します。
+    ワーカープロセスで実行されます。
+    """
+    return [_convert_member_with_stats(name, data, engine, field_limit) for name, data in batch]
+
+def _batches(members, size: int):
+    batch = []
+    for member in members:
+        batch.append(member)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def count_xml_members(zip_ref: zipfile.ZipFile) -> Optional[int]:
+    """ZIP内のXMLメンバー数を返します。入れ子のZIPを含む場合は開くまで分からないため None を返します。"""
+    names = [info.filename.lower() for info in zip_ref.infolist() if not info.is_dir()]
+    if any(name.endswith('.zip') for name in names):
+        return None
+    return sum(name.endswith('.xml') for name in names)
+
+def _batch_results(sizes: list, future) -> list:
+    return [(name, size, data, stats) for (name, size), (data, stats) in zip(sizes, future.result())]
+
+def _member_results(members, workers: int, engine: Optional[str], field_limit: Optional[FieldLimit]):
+    """(メンバーのパス, 内容のバイト数, 行データ, stats) をメンバーの順序どおりに返します。"""
+    if workers <= 1:
+        for name, data in members:
+            yield (name, len(data), *_convert_member_with_stats(name, data, engine, field_limit))
+        return
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for batch in _batches(members, BATCH_SIZE):
+            sizes = [(name, len(data)) for name, data in batch]
+            pending.append((sizes, executor.submit(convert_batch, batch, engine, field_limit)))
+            if len(pending) >= workers * 2:
+                yield from _batch_results(*pending.popleft())
+        while pending:
+            yield from _batch_results(*pending.popleft())
+
+def iter_zip_rows(zip_ref: zipfile.ZipFile, workers: int = 1, members: Optional[set] = None,
+                  engine: Optional[str] = None, field_limit: Optional[FieldLimit] = None):
+    """ZIP内のXMLを変換した行データを、メンバーの順序どおりに返すジェネレータです。
+
+    workers が2以上ならプロセスプールで並列に変換します。ZIPの読み出しは呼び出し元で行い、
+    未処理のバッチを workers の2倍までに抑えてメモリ使用量を一定にします。
+    各メンバーの結果と処理時間は呼び出し元のプロセスで METRICS に記録します。
+    members（メンバーのパスの集合）を指定すると、それ以外のメンバーは読み出しません。
+    engine と field_limit は convert_file と同じです。
+    """
+    total = count_xml_members(zip_ref) if members is None else len(members)
+    contents = iter_xml_members(zip_ref, names=members)
+    for done, (name, size, data, stats) in enumerate(_member_results(contents, workers, engine, field_limit), 1):
+        record_conversion(name, size, data, stats, done, total)
+        yield data
+
+def zip_to_csv(zip_path: str, output_path: str, workers: Optional[int] = None,
+               partition: str = 'number', format: str = 'csv', members: Optional[Iterable[str]] = None,
+               engine: Optional[str] = None, max_field_chars: Optional[int] = None, oversized: str = 'spill'):
+    """ZIPファイル内のXMLを、中間ファイルを作らずに直接CSVへ変換します。
+
+    extract_zip・copy_xml_and_chg_ipt_codec・xml_to_csv を順に実行した場合と同じ行を出力します
+    （行の順序はZIP内のメンバーの順序になります）。入れ子のZIPにも対応します。
+    format は出力形式で、sinks.FORMATS のいずれかを指定します。
+    members にメンバーのパス（scanner.HeaderIndex.select の結果など）を指定すると、
+    それらのメンバーだけを変換します。engine は解析エンジン（convert.ENGINES のいずれか）です。
+    max_field_chars と oversized は convert.xml_to_csv と同じです。
+    処理したメンバー数・処理時間は metrics.METRICS の 'convert' 段階に記録します。
+    """
+    opt_path = Path(output_path)
+    opt_path.mkdir(parents=True, exist_ok=True)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    engine = resolve_engine(engine)
+    field_limit = make_field_limit(max_field_chars, oversized, opt_path)
+
+    try:
+        with METRICS.stage('convert'), zipfile.ZipFile(zip_path, 'r') as zip_ref, \
+             open_sink(opt_path, COLUMNS, format, partition) as sink:
+            count = 0
+            selected = None if members is None else set(members)
+            for data in iter_zip_rows(zip_ref, workers, selected, engine, field_limit):
+                count += 1
+                if data:
+                    sink.write(data)
+        logging.info(f"ZIPファイル '{zip_path}' の変換が完了しました。処理されたファイル数: {count}"
+                     f"、出力した行数: {sink.rows_written}")
+        for stage in ('convert', 'parse', 'extract', 'write'):
+            METRICS.log_summary(stage)
+    except zipfile.BadZipFile:
+        logging.error(f"ファイル '{zip_path}' は有効なZIPファイルではありません。")
+        raise
+    except Exception as e:
+        logging.error(f"ZIPファイル '{zip_path}' の変換中にエラーが発生しました: {str(e)}")
+        raise
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="ZIPファイル内のXMLを直接CSVに変換します。")
+    parser.add_argument('zip_file', help="入力ZIPファイル")
+    parser.add_argument('output_dir', help="出力ディレクトリ")
+    add_conversion_arguments(parser)
+    add_field_limit_arguments(parser)
+    add_selection_arguments(parser)
+    args = parser.parse_args()
+
+    with console_stats() if args.stats else contextlib.nullcontext():
+        # --kind・--month は書誌事項のインデックスで変換するメンバーを絞り込みます
+        members = select_sources(args.zip_file, args.output_dir, args.kind, args.month)
+        zip_to_csv(args.zip_file, args.output_dir, workers=args.workers, partition=args.partition,
+                   format=args.format, members=members, engine=args.engine,
+                   max_field_chars=args.max_field_chars, oversized=args.oversized)
@@ -0,0 +1,275 @@
+import re
+import sqlite3
+import logging
+import zipfile
+import argparse
+from pathlib import Path
+from typing import Iterable, NamedTuple, Optional
+from xml.sax.saxutils import unescape
+
+from metrics import setup_logging
+setup_logging('scanner.log')
+
+from encoding import declared_encoding
+from unzip import iter_xml_infos
+from manifest import MANIFEST_NAME
+from metrics import METRICS
+
+# ファイルの先頭から読み込むバイト数（書誌事項の先頭にある publication-reference は通常この範囲に収まります）
+HEADER_SIZE = 8 * 1024
+# publication-reference が見つからない場合に読み足す上限
+MAX_HEADER_SIZE = 64 * 1024
+
+# 入力ディレクトリ（またはZIPファイルの隣）に作成するインデックスのファイル名
+INDEX_NAME = 'publication_index.sqlite3'
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS headers (
+    archive TEXT NOT NULL,   -- ZIPファイル名（ディレクトリ内のファイルは ''）
+    source TEXT NOT NULL,    -- 入力ディレクトリからの相対パス、またはZIP内のメンバーのパス
+    size INTEGER NOT NULL,
+    stamp INTEGER NOT NULL,  -- ファイルの更新日時（ns）、ZIPのメンバーは CRC-32
+    kind TEXT,
+    number TEXT,
+    date TEXT,
+    application_number TEXT,
+    PRIMARY KEY (archive, source)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS headers_date ON headers (date);
+CREATE INDEX IF NOT EXISTS headers_number ON headers (number);
+'''
+
+class Header(NamedTuple):
+    """文書の先頭から読み取った書誌事項です。見つからなかった項目は None です。"""
+    source: str
+    kind: Optional[str]
+    number: Optional[str]
+    date: Optional[str]
+    application_number: Optional[str]
+
+# タグはASCIIのため、EUC-JP・UTF-8 のどちらでもバイト列のまま照合できます
+# （どちらのマルチバイト文字も '<' などのASCIIのバイトを含みません）
+_PUBLICATION_RE = re.compile(rb'<publication-reference\b[^>]*>(.*?)</publication-reference>', re.S)
+_APPLICATION_RE = re.compile(rb'<application-reference\b[^>]*>(.*?)</application-reference>', re.S)
+_FIELD_RES = {tag: re.compile(rb'<' + tag + rb'>([^<]*)</' + tag + rb'>')
+              for tag in (b'doc-number', b'kind', b'date')}
+
+def _field(block: Optional[bytes], tag: bytes, encoding: str) -> Optional[str]:
+    if block is None:
+        return None
+    match = _FIELD_RES[tag].search(block)
+    return unescape(match.group(1).decode(encoding, errors='replace')) if match else None
+
+def scan_header(head: bytes, source: str, partial: bool = False) -> Optional[Header]:
+    """XMLの先頭のバイト列から書誌事項を読み取ります。
+
+    publication-reference と application-reference の両方が head に含まれていなければ None を返します。
+    partial を指定すると、見つかった方の項目だけを埋めて返します。
+    """
+    publication = _PUBLICATION_RE.search(head)
+    application = _APPLICATION_RE.search(head)
+    if not partial and (publication is None or application is None):
+        return None
+    encoding = declared_encoding(head)
+    publication = publication.group(1) if publication else None
+    application = application.group(1) if application else None
+    return Header(source, _field(publication, b'kind', encoding), _field(publication, b'doc-number', encoding),
+                  _field(publication, b'date', encoding), _field(application, b'doc-number', encoding))
+
+def read_header(stream, source: str) -> Header:
+    """ストリームの先頭 HEADER_SIZE バイトから書誌事項を読み取ります。
+
+    見つからなければ MAX_HEADER_SIZE まで読み足し、それでも見つからない項目は None にします。
+    """
+    head = stream.read(HEADER_SIZE)
+    METRICS.count('scan.bytes_in', len(head))
+    while True:
+        header = scan_header(head, source)
+        if header is not None:
+            return header
+        if len(head) >= MAX_HEADER_SIZE:
+            break
+        more = stream.read(len(head))
+        if not more:
+            break
+        METRICS.count('scan.bytes_in', len(more))
+        head += more
+    # 片方だけ見つかった場合も、分かった項目は記録します
+    logging.warning(f"'{source}' の先頭 {len(head)} バイトに書誌事項が見つかりませんでした。")
+    return scan_header(head, source, partial=True)
+
+def default_index_path(output_dir, input_path) -> Path:
+    """入力（ディレクトリまたはZIPファイル）に対応するインデックスの既定のパスを返します。
+
+    入力は読み取り専用の場合もあるため、インデックスは出力ディレクトリに作ります
+    （ZIPファイルの場合は '<ZIPファイル名の拡張子なし>_' を付けた名前です）。
+    """
+    input_path = Path(input_path)
+    if input_path.is_dir():
+        return Path(output_dir) / INDEX_NAME
+    return Path(output_dir) / f"{input_path.stem}_{INDEX_NAME}"
+
+class HeaderIndex:
+    """文書の書誌事項（公開種別・公開番号・公開日・出願番号）を記録する SQLite のインデックスです。
+
+    update_directory・update_zip で作成・更新し、select で条件に合う文書を選びます。
+    サイズと更新日時（ZIPのメンバーは CRC）が記録と同じ文書は読み直しません。
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._conn = sqlite3.connect(self.path)
+        self._conn.executescript(_SCHEMA)
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _records(self, archive: str) -> dict:
+        return {source: (size, stamp) for source, size, stamp
+                in self._conn.execute('SELECT source, size, stamp FROM headers WHERE archive = ?', (archive,))}
+
+    def _store(self, archive: str, entries: list, seen: set):
+        """読み取った書誌事項を記録し、入力から無くなった文書の記録を削除します。"""
+        with self._conn:
+            self._conn.executemany('INSERT OR REPLACE INTO headers VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                                   [(archive, header.source, size, stamp, *header[1:])
+                                    for header, size, stamp in entries])
+            removed = [(archive, source) for source in self._records(archive) if source not in seen]
+            self._conn.executemany('DELETE FROM headers WHERE archive = ? AND source = ?', removed)
+
+    def update_directory(self, input_dir: Path) -> int:
+        """ディレクトリ内のXMLファイルの書誌事項を記録し、読み取ったファイル数を返します。"""
+        input_dir = Path(input_dir)
+        records = self._records('')
+        entries = []
+        seen = set()
+        with METRICS.stage('scan'):
+            for xml_file in sorted(input_dir.glob('**/*.xml')):
+                source = xml_file.relative_to(input_dir).as_posix()
+                seen.add(source)
+                stat = xml_file.stat()
+                if records.get(source) == (stat.st_size, stat.st_mtime_ns):
+                    continue
+                with open(xml_file, 'rb') as f:
+                    header = read_header(f, source)
+                METRICS.count('scan.files')
+                entries.append((header, stat.st_size, stat.st_mtime_ns))
+            self._store('', entries, seen)
+        logging.info(f"'{input_dir}' の {len(entries)} 件のファイルの書誌事項を記録しました。"
+                     f"（変更なし: {len(seen) - len(entries)} 件）")
+        return len(entries)
+
+    def update_zip(self, zip_path: Path) -> int:
+        """ZIPファイル内（入れ子のZIPを含む）のXMLの書誌事項を記録し、読み取ったメンバー数を返します。
+
+        メンバーは先頭だけを展開します。
+        """
+        zip_path = Path(zip_path)
+        archive = zip_path.name
+        records = self._records(archive)
+        entries = []
+        seen = set()
+        with METRICS.stage('scan'), zipfile.ZipFile(zip_path, 'r') as zip_ref:
+            for source, owner, info in iter_xml_infos(zip_ref):
+                seen.add(source)
+                if records.get(source) == (info.file_size, info.CRC):
+                    continue
+                with owner.open(info) as member:
+                    header = read_header(member, source)
+                METRICS.count('scan.files')
+                entries.append((header, info.file_size, info.CRC))
+            self._store(archive, entries, seen)
+        logging.info(f"'{zip_path}' の {len(entries)} 件のメンバーの書誌事項を記録しました。"
+                     f"（変更なし: {len(seen) - len(entries)} 件）")
+        return len(entries)
+
+    def update(self, input_path) -> int:
+        """入力がディレクトリなら update_directory、ZIPファイルなら update_zip を実行します。"""
+        if Path(input_path).is_dir():
+            return self.update_directory(input_path)
+        return self.update_zip(input_path)
+
+    def select(self, archive: str = '', kinds: Optional[Iterable[str]] = None,
+               months: Optional[Iterable[str]] = None, not_converted_in: Optional[Path] = None) -> list:
+        """条件に合う文書のパスを返します。
+
+        kinds は公開種別の先頭の文字列（例: '公表'）、months は公開月（'YYYYMM'）で、
+        それぞれいずれかに一致する文書を選びます。not_converted_in に出力ディレクトリを
+        指定すると、そのマニフェスト（xml_to_csv の incremental）に記録済みの文書を除きます
+        （ディレクトリの入力のみ）。
+        """
+        conditions = ['archive = ?']
+        params = [archive]
+        if kinds:
+            kinds = list(kinds)
+            # 部分一致にすると '公表' で再公表特許(A1) まで選ばれるため、先頭の一致で比べます
+            conditions.append('(' + ' OR '.join(['substr(kind, 1, length(?)) = ?'] * len(kinds)) + ')')
+            params += [value for kind in kinds for value in (kind, kind)]
+        if months:
+            months = list(months)
+            conditions.append(f"substr(date, 1, 6) IN ({', '.join('?' * len(months))})")
+            params += months
+        attached = False
+        if not_converted_in is not None:
+            manifest_path = Path(not_converted_in) / MANIFEST_NAME
+            if manifest_path.exists():
+                self._conn.execute('ATTACH DATABASE ? AS converted', (str(manifest_path),))
+                attached = True
+                conditions.append('source NOT IN (SELECT path FROM converted.sources)')
+            else:
+                logging.warning(f"'{not_converted_in}' にマニフェストが無いため、変換済みの文書を判定できません。")
+        try:
+            query = f"SELECT source FROM headers WHERE {' AND '.join(conditions)} ORDER BY source"
+            return [source for source, in self._conn.execute(query, params)]
+        finally:
+            if attached:
+                self._conn.execute('DETACH DATABASE converted')
+
+def add_selection_arguments(parser: argparse.ArgumentParser):
+    """インデックスで入力を絞り込むためのCLIの引数を追加します。"""
+    parser.add_argument('--kind', action='append',
+                        help="公開種別の先頭の文字列で入力を絞り込む（例: 公表。再公表特許は 再公表、複数指定可）")
+    parser.add_argument('--month', action='append',
+                        help="公開月（YYYYMM）で入力を絞り込む（複数指定可）")
+
+def select_sources(input_path, output_dir, kinds=None, months=None, not_converted_in=None) -> Optional[list]:
+    """インデックスを更新して条件に合う文書のパスを返します。条件が無ければ None を返します。
+
+    インデックスは output_dir（default_index_path）に作ります。
+    """
+    if not kinds and not months and not_converted_in is None:
+        return None
+    input_path = Path(input_path)
+    Path(output_dir).mkdir(parents=True, exist_ok=True)
+    with HeaderIndex(default_index_path(output_dir, input_path)) as index:
+        index.update(input_path)
+        archive = '' if input_path.is_dir() else input_path.name
+        return index.select(archive, kinds, months, not_converted_in)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="XMLの先頭だけを読んで書誌事項のインデックスを作成し、条件に合う文書を表示します。")
+    parser.add_argument('input', help="入力ディレクトリまたはZIPファイル")
+    parser.add_argument('--index', required=True,
+                        help="インデックスのパス（入力とは別の場所に作成します。"
+                             f"convert.py・pipeline.py は出力ディレクトリの {INDEX_NAME} を使います）")
+    add_selection_arguments(parser)
+    parser.add_argument('--not-converted', metavar='OUTPUT_DIR',
+                        help="出力ディレクトリのマニフェストに記録済みの文書を除く")
+    args = parser.parse_args()
+
+    input_path = Path(args.input)
+    with HeaderIndex(args.index) as index:
+        scanned = index.update(input_path)
+        archive = '' if input_path.is_dir() else input_path.name
+        if args.kind or args.month or args.not_converted:
+            for source in index.select(archive, args.kind, args.month, args.not_converted):
+                print(source)
+        else:
+            print(f"{scanned} 件の書誌事項を記録しました。（{index.path}）")
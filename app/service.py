@@ -0,0 +1,371 @@
+import os
+import json
+import time
+import shutil
+import signal
+import logging
+import zipfile
+import argparse
+import threading
+import multiprocessing
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+from metrics import setup_logging
+setup_logging('service.log')
+
+from unzip import extract_zip
+from encoding import copy_xml_and_chg_ipt_codec
+from convert import (add_conversion_arguments, add_field_limit_arguments, make_field_limit, resolve_engine,
+                     xml_to_csv)
+from pipeline import count_xml_members, zip_to_csv
+from metrics import METRICS
+
+# 受信フォルダを確認する間隔（秒）
+POLL_INTERVAL = 5.0
+# 変換中の状態ファイルを更新する間隔（秒）
+STATUS_INTERVAL = 5.0
+
+# 処理を終えたZIPファイルの移動先（受信フォルダからの相対パス）
+PROCESSED_DIR = 'processed'
+FAILED_DIR = 'failed'
+
+# 作業中の出力ディレクトリの接頭辞（出力ディレクトリ内に作り、完了したら名前を変えます）
+WORK_PREFIX = '.work-'
+
+# メモリ使用量の見積もり：ワーカー1つあたりの固定分（MB）と、最大のメンバーに対する解析後の木の大きさの倍率
+WORKER_BASE_MB = 40
+TREE_FACTOR = 10
+
+# 状態ファイルに記録するエラーメッセージの上限
+MAX_ERROR_MESSAGES = 100
+
+def status_path(output_root: Path, zip_name: str) -> Path:
+    """アーカイブの状態ファイル（出力ディレクトリの '<ZIPファイル名の拡張子なし>.status.json'）のパスを返します。"""
+    return Path(output_root) / f"{Path(zip_name).stem}.status.json"
+
+def write_status(path: Path, status: dict):
+    """状態ファイルを書き換えます。一時ファイルに書いてから置き換えるため、読み手が書きかけの内容を見ることはありません。"""
+    temporary = path.with_name(path.name + '.tmp')
+    temporary.write_text(json.dumps(status, ensure_ascii=False, indent=2) + '\n', encoding='utf_8')
+    os.replace(temporary, path)
+
+def estimate_memory_mb(zip_path: Path, workers: int) -> float:
+    """アーカイブを workers 個のワーカーで変換するときのメモリ使用量を見積もります（MB）。
+
+    解析中の木は最大のメンバー（入れ子のZIPはその大きさ）の TREE_FACTOR 倍として数えます。
+    """
+    with zipfile.ZipFile(zip_path) as zip_ref:
+        largest = max((info.file_size for info in zip_ref.infolist() if not info.is_dir()), default=0)
+    return workers * (WORKER_BASE_MB + largest * TREE_FACTOR / 1024 / 1024)
+
+def _now() -> str:
+    return datetime.now().astimezone().isoformat(timespec='seconds')
+
+class _ErrorCollector(logging.Handler):
+    """変換中に記録されたエラーのメッセージを集めます（状態ファイルに記録します）。"""
+
+    def __init__(self):
+        super().__init__(level=logging.ERROR)
+        self.messages = []
+        self.dropped = 0
+
+    def emit(self, record):
+        if len(self.messages) < MAX_ERROR_MESSAGES:
+            self.messages.append(record.getMessage())
+        else:
+            self.dropped += 1
+
+def _commit(work_dir: Path, output_dir: Path):
+    """作業ディレクトリの名前を変えて出力を確定します。
+
+    同じ名前の出力が既にあれば退避してから置き換え、置き換えた後で削除します。
+    """
+    replaced = None
+    if output_dir.exists():
+        replaced = output_dir.with_name(f"{WORK_PREFIX}replaced-{output_dir.name}-{os.getpid()}")
+        os.replace(output_dir, replaced)
+    os.replace(work_dir, output_dir)
+    if replaced is not None:
+        shutil.rmtree(replaced, ignore_errors=True)
+
+def _ignore_interrupt():
+    # Ctrl+C はサービス本体だけが受け取り、変換中のアーカイブは最後まで処理させます
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+def process_archive(zip_path: str, output_root: str, workers: int, options: dict, status: dict) -> dict:
+    """1つのアーカイブを extract_zip・copy_xml_and_chg_ipt_codec・xml_to_csv で変換し、出力を確定します。
+
+    ワーカープロセスで実行されます。変換は出力ディレクトリ内の作業ディレクトリで行い、
+    完了したら '<ZIPファイル名の拡張子なし>' に名前を変えます。状態ファイルは STATUS_INTERVAL ごとに更新し、
+    最終的な状態（'completed'・'completed_with_errors'・'failed'）を返します。
+    各段階が最後まで終わった場合だけ出力を確定し、途中で失敗した場合は 'failed' として
+    作業ディレクトリを削除します（以前の出力はそのまま残ります）。
+    options の keep_intermediate が偽なら extracted/ と utf8/ は確定前に削除します。
+    入れ子のZIPを含むアーカイブは、中間ファイルを作らずに pipeline.zip_to_csv で変換します。
+    """
+    zip_path = Path(zip_path)
+    output_root = Path(output_root)
+    work_dir = output_root / f"{WORK_PREFIX}{zip_path.stem}-{os.getpid()}"
+    output_dir = output_root / zip_path.stem
+    path = status_path(output_root, zip_path.name)
+    METRICS.reset()
+    collector = _ErrorCollector()
+    logging.getLogger().addHandler(collector)
+    lock = threading.Lock()
+    status = dict(status, state='running', started_at=_now(), workers=workers)
+
+    def update(**fields):
+        with lock:
+            status.update(fields, errors=collector.messages[:], **METRICS.snapshot())
+            if collector.dropped:
+                status['errors_dropped'] = collector.dropped
+            write_status(path, status)
+
+    stop = threading.Event()
+
+    def report():
+        while not stop.wait(STATUS_INTERVAL):
+            update()
+
+    reporter = threading.Thread(target=report, daemon=True)
+    start = time.perf_counter()
+    try:
+        update()
+        reporter.start()
+        shutil.rmtree(work_dir, ignore_errors=True)
+        work_dir.mkdir(parents=True)
+        with zipfile.ZipFile(zip_path) as zip_ref:
+            nested = count_xml_members(zip_ref) is None
+        conversion = {'format': options['format'], 'partition': options['partition'], 'engine': options['engine'],
+                      'max_field_chars': options['max_field_chars'], 'oversized': options['oversized']}
+        if nested:
+            # 入れ子のZIPは extract_zip で展開されないため、ZIPから直接変換します
+            zip_to_csv(str(zip_path), str(work_dir / 'csv'), workers=workers, **conversion)
+        else:
+            # XMLを含まないアーカイブでも後続の段階が入力ディレクトリを見つけられるよう、先に作ります
+            (work_dir / 'extracted').mkdir()
+            extract_zip(str(zip_path), str(work_dir / 'extracted'), workers=workers)
+            copy_xml_and_chg_ipt_codec(str(work_dir / 'extracted'), str(work_dir / 'utf8'), workers=workers)
+            xml_to_csv(str(work_dir / 'utf8'), str(work_dir / 'csv'), workers=workers, **conversion)
+        if not options['keep_intermediate']:
+            shutil.rmtree(work_dir / 'extracted', ignore_errors=True)
+            shutil.rmtree(work_dir / 'utf8', ignore_errors=True)
+        _commit(work_dir, output_dir)
+        counters = METRICS.snapshot()['counters']
+        errors = sum(counters.get(f'{stage}.errors', 0) for stage in ('transcode', 'convert', 'write'))
+        state = 'completed_with_errors' if errors or collector.messages else 'completed'
+        logging.info(f"アーカイブ '{zip_path.name}' の変換が完了しました。（{state}）")
+        fields = {'state': state, 'output': str(output_dir)}
+    except Exception as e:
+        logging.error(f"アーカイブ '{zip_path.name}' の変換中にエラーが発生しました: {str(e)}")
+        shutil.rmtree(work_dir, ignore_errors=True)
+        fields = {'state': 'failed', 'error': str(e)}
+    finally:
+        stop.set()
+        if reporter.is_alive():
+            reporter.join()
+        logging.getLogger().removeHandler(collector)
+    update(finished_at=_now(), seconds=round(time.perf_counter() - start, 3), **fields)
+    return status
+
+class _Job(NamedTuple):
+    zip_path: Path
+    workers: int
+    memory_mb: float
+
+class BatchService:
+    """受信フォルダに置かれたZIPファイルを、変換が終わるまで無人で処理するサービスです。
+
+    受信フォルダを poll_interval ごとに確認し、大きさと更新日時が前回から変わっていない（書き込みが終わった）
+    ZIPファイルを到着順の待ち行列に入れます。待ち行列のアーカイブは、CPUとメモリの予算の範囲で
+    最大 jobs 個を別々のプロセスで同時に変換します。
+
+    - CPU の予算は cpus（省略時はCPUコア数）で、変換中のアーカイブのワーカー数の合計がこれを超えないようにします。
+      1つのアーカイブのワーカー数は cpus を jobs で割った数です。
+    - メモリの予算は memory_mb（省略時は制限なし）で、estimate_memory_mb の見積もりの合計がこれを超える場合は
+      ワーカー数を減らし、それでも足りなければ他のアーカイブの完了を待ちます
+      （他に変換中のアーカイブが無ければ、予算を超えても1ワーカーで変換します）。
+
+    変換が終わったZIPファイルは受信フォルダの processed/（失敗した場合は failed/）に移します。
+    出力と状態ファイルについては process_archive を参照してください。
+    """
+
+    def __init__(self, inbox: str, output_root: str, cpus: Optional[int] = None, jobs: Optional[int] = None,
+                 memory_mb: Optional[float] = None, poll_interval: float = POLL_INTERVAL,
+                 keep_intermediate: bool = False, partition: str = 'number', format: str = 'csv',
+                 engine: Optional[str] = None, max_field_chars: Optional[int] = None, oversized: str = 'spill'):
+        self.inbox = Path(inbox)
+        self.output_root = Path(output_root)
+        self.cpus = max(1, cpus or os.cpu_count() or 1)
+        self.jobs = max(1, jobs or self.cpus // 4 or 1)
+        self.workers_per_job = max(1, self.cpus // self.jobs)
+        self.memory_mb = memory_mb
+        self.poll_interval = poll_interval
+        self.options = {'keep_intermediate': keep_intermediate, 'partition': partition, 'format': format,
+                        'engine': resolve_engine(engine), 'max_field_chars': max_field_chars,
+                        'oversized': oversized}
+        # 本文の上限の指定に誤りがあれば、アーカイブごとに失敗させずに起動時に知らせます
+        make_field_limit(max_field_chars, oversized, self.output_root)
+        self.stopping = threading.Event()
+        self.queue = []
+        self.running = {}
+        self._sizes = {}
+
+    def stop(self):
+        """新しいアーカイブの受け付けをやめ、変換中のアーカイブが終わったら run を終了させます。"""
+        self.stopping.set()
+
+    def poll(self, settle: bool = True) -> list:
+        """受信フォルダに新しく届いたZIPファイルを待ち行列に加え、加えたファイルのリストを返します。
+
+        settle が真なら、大きさと更新日時が前回の確認から変わっていないファイルだけを加えます。
+        """
+        known = set(self.queue) | {job.zip_path for job in self.running.values()}
+        sizes = {}
+        added = []
+        for zip_path in sorted(self.inbox.glob('*.zip'), key=lambda path: path.stat().st_mtime_ns):
+            if zip_path in known or zip_path.name.startswith('.'):
+                continue
+            stat = zip_path.stat()
+            sizes[zip_path] = (stat.st_size, stat.st_mtime_ns)
+            if settle and self._sizes.get(zip_path) != sizes[zip_path]:
+                continue
+            self.queue.append(zip_path)
+            added.append(zip_path)
+            write_status(status_path(self.output_root, zip_path.name),
+                         {'archive': zip_path.name, 'state': 'queued', 'queued_at': _now()})
+            logging.info(f"アーカイブ '{zip_path.name}' を待ち行列に加えました。")
+        self._sizes = {path: size for path, size in sizes.items() if path not in added}
+        return added
+
+    def _admit(self, zip_path: Path) -> Optional[_Job]:
+        """予算の範囲で変換を始められれば、ワーカー数とメモリの見積もりを返します。"""
+        free_cpus = self.cpus - sum(job.workers for job in self.running.values())
+        if free_cpus < 1 or len(self.running) >= self.jobs:
+            return None
+        workers = min(self.workers_per_job, free_cpus)
+        if self.memory_mb is None:
+            return _Job(zip_path, workers, estimate_memory_mb(zip_path, workers))
+        free_memory = self.memory_mb - sum(job.memory_mb for job in self.running.values())
+        while workers > 1 and estimate_memory_mb(zip_path, workers) > free_memory:
+            workers -= 1
+        memory_mb = estimate_memory_mb(zip_path, workers)
+        if memory_mb > free_memory:
+            if self.running:
+                return None
+            logging.warning(f"アーカイブ '{zip_path.name}' の見積もり（{memory_mb:.0f}MB）がメモリの予算を超えていますが、"
+                            "他に変換中のアーカイブが無いため1ワーカーで変換します。")
+        return _Job(zip_path, workers, memory_mb)
+
+    def _start_jobs(self, executor: ProcessPoolExecutor):
+        while self.queue and not self.stopping.is_set():
+            zip_path = self.queue[0]
+            try:
+                job = self._admit(zip_path)
+            except (OSError, zipfile.BadZipFile) as e:
+                # 読めないZIPファイルも process_archive に渡し、失敗として記録させます
+                logging.error(f"アーカイブ '{zip_path.name}' のメモリ使用量を見積もれません: {str(e)}")
+                job = _Job(zip_path, 1, 0.0) if not self.running else None
+            if job is None:
+                return
+            self.queue.pop(0)
+            path = status_path(self.output_root, zip_path.name)
+            status = {'archive': zip_path.name, 'state': 'queued', 'memory_estimate_mb': round(job.memory_mb, 1)}
+            if path.exists():
+                status['queued_at'] = json.loads(path.read_text(encoding='utf_8')).get('queued_at')
+            future = executor.submit(process_archive, str(zip_path), str(self.output_root), job.workers,
+                                     self.options, status)
+            self.running[future] = job
+            logging.info(f"アーカイブ '{zip_path.name}' の変換を開始しました。"
+                         f"（ワーカー数: {job.workers}、見積もり: {job.memory_mb:.0f}MB）")
+
+    def _finish(self, future):
+        job = self.running.pop(future)
+        try:
+            state = future.result()['state']
+        except Exception as e:
+            # 変換プロセスの異常終了など、process_archive が状態を記録できなかった場合です
+            state = 'failed'
+            write_status(status_path(self.output_root, job.zip_path.name),
+                         {'archive': job.zip_path.name, 'state': state, 'finished_at': _now(),
+                          'error': f"変換プロセスが異常終了しました: {str(e)}"})
+        destination = self.inbox / (FAILED_DIR if state == 'failed' else PROCESSED_DIR)
+        destination.mkdir(exist_ok=True)
+        os.replace(job.zip_path, destination / job.zip_path.name)
+        logging.info(f"アーカイブ '{job.zip_path.name}' を {destination.name}/ に移しました。（{state}）")
+
+    def _cleanup(self):
+        """前回中断したときに残った作業ディレクトリを削除します。"""
+        for work_dir in self.output_root.glob(f'{WORK_PREFIX}*'):
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    def run(self, once: bool = False):
+        """サービスを実行します。
+
+        once を指定すると、受信フォルダにあるZIPファイルを（書き込みの完了を待たずに）すべて変換して終了します。
+        stop が呼ばれると新しい変換を始めず、変換中のアーカイブが終わってから終了します
+        （待ち行列に残ったZIPファイルは受信フォルダに残り、次回の起動時に変換されます）。
+        """
+        self.output_root.mkdir(parents=True, exist_ok=True)
+        self._cleanup()
+        logging.info(f"受信フォルダ '{self.inbox}' の監視を開始しました。（CPU: {self.cpus}、同時変換数: {self.jobs}、"
+                     f"メモリ: {self.memory_mb or '制限なし'}MB）")
+        executor = ProcessPoolExecutor(max_workers=self.jobs, initializer=_ignore_interrupt)
+        try:
+            if once:
+                self.poll(settle=False)
+            while True:
+                if not once and not self.stopping.is_set():
+                    self.poll()
+                self._start_jobs(executor)
+                if not self.running:
+                    if self.stopping.is_set() or (once and not self.queue):
+                        break
+                    self.stopping.wait(self.poll_interval)
+                    continue
+                done, _ = wait(list(self.running), timeout=self.poll_interval, return_when=FIRST_COMPLETED)
+                broken = False
+                for future in done:
+                    broken = broken or isinstance(future.exception(), BrokenProcessPool)
+                    self._finish(future)
+                if broken:
+                    # 異常終了したプロセスがあるとプール全体が使えなくなるため、作り直します
+                    for future in list(self.running):
+                        self._finish(future)
+                    executor.shutdown(wait=True)
+                    executor = ProcessPoolExecutor(max_workers=self.jobs, initializer=_ignore_interrupt)
+        finally:
+            executor.shutdown(wait=True)
+        logging.info(f"受信フォルダ '{self.inbox}' の監視を終了しました。")
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    parser = argparse.ArgumentParser(
+        description="受信フォルダに置かれたZIPファイルを監視し、CPUとメモリの予算の範囲で並行してCSVに変換します。")
+    parser.add_argument('inbox', help="受信フォルダ（ZIPファイルを置くディレクトリ）")
+    parser.add_argument('output_dir', help="出力ディレクトリ（アーカイブごとのディレクトリと状態ファイルを作成します）")
+    parser.add_argument('--cpus', type=int, default=os.cpu_count() or 1,
+                        help="変換に使うCPUの数（既定: CPUコア数）")
+    parser.add_argument('--jobs', type=int, help="同時に変換するアーカイブの最大数（既定: CPUの数の1/4、最低1）")
+    parser.add_argument('--memory-mb', type=float, help="変換中のアーカイブのメモリ使用量の見積もりの上限（MB）")
+    parser.add_argument('--interval', type=float, default=POLL_INTERVAL,
+                        help=f"受信フォルダを確認する間隔（秒、既定: {POLL_INTERVAL}）")
+    parser.add_argument('--once', action='store_true', help="受信フォルダにあるZIPファイルを変換したら終了する")
+    parser.add_argument('--keep-intermediate', action='store_true', help="extracted/・utf8/ を出力に残す")
+    # 並列度は --cpus で指定し、進捗は状態ファイルに書き出すため --workers と --stats は持ちません
+    add_conversion_arguments(parser, workers=False, stats=False)
+    add_field_limit_arguments(parser)
+    args = parser.parse_args()
+
+    service = BatchService(args.inbox, args.output_dir, cpus=args.cpus, jobs=args.jobs, memory_mb=args.memory_mb,
+                           poll_interval=args.interval, keep_intermediate=args.keep_intermediate,
+                           partition=args.partition, format=args.format, engine=args.engine,
+                           max_field_chars=args.max_field_chars, oversized=args.oversized)
+    # SIGTERM（サービスの停止）と Ctrl+C では、変換中のアーカイブを終えてから終了します
+    signal.signal(signal.SIGTERM, lambda signum, frame: service.stop())
+    signal.signal(signal.SIGINT, lambda signum, frame: service.stop())
+    service.run(once=args.once)
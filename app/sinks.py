@@ -0,0 +1,149 @@
+import time
+import logging
+import sqlite3
+from datetime import date
+from pathlib import Path
+
+from writer import CsvWriterPool, Sink
+from metrics import METRICS
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:  # pyarrow はインストールされている場合だけ使います
+    pa = None
+
+# 列の型（convert.COLUMN_SPECS の type）に対応する SQLite の型
+SQLITE_TYPES = {'text': 'TEXT', 'int': 'INTEGER', 'date': 'TEXT'}
+
+def _to_int(value: str):
+    return int(value) if value.isdigit() else None
+
+def _to_date(value: str):
+    if len(value) != 8 or not value.isdigit():
+        return None
+    try:
+        return date(int(value[:4]), int(value[4:6]), int(value[6:]))
+    except ValueError:
+        return None
+
+_CONVERTERS = {'text': lambda value: value, 'int': _to_int, 'date': _to_date}
+
+def typed_row(row: list, types: list) -> list:
+    """extract_data の行（すべて文字列）を列の型に合わせた値に変換します。'None' は欠損値になります。"""
+    return [None if value == 'None' else _CONVERTERS[column_type](value)
+            for column_type, value in zip(types, row)]
+
+class SqliteSink(Sink):
+    """行を SQLite のテーブルに executemany でまとめて挿入します。
+
+    columns は (列名, 型) のリストです。日付は 'YYYY-MM-DD' 形式の文字列で格納します。
+    テーブルは開くたびに作り直します（ArrowSink と同じく、実行するたびに出力を置き換えます）。
+    """
+
+    def __init__(self, output_dir: Path, columns: list, buffer_rows: int = 1000, table: str = 'publications'):
+        self.path = Path(output_dir) / f"{table}.sqlite3"
+        self.types = [column_type for _, column_type in columns]
+        self.buffer_rows = buffer_rows
+        self.rows_written = 0
+        self._buffer = []
+        self._conn = sqlite3.connect(self.path)
+        definitions = ', '.join(f'"{name}" {SQLITE_TYPES[column_type]}' for name, column_type in columns)
+        with self._conn:
+            self._conn.execute(f'DROP TABLE IF EXISTS "{table}"')
+            self._conn.execute(f'CREATE TABLE "{table}" ({definitions})')
+        self._insert = f'INSERT INTO "{table}" VALUES ({", ".join("?" * len(columns))})'
+
+    def write(self, row: list):
+        values = typed_row(row, self.types)
+        self._buffer.append([value.isoformat() if isinstance(value, date) else value for value in values])
+        if len(self._buffer) >= self.buffer_rows:
+            self.flush()
+
+    def flush(self):
+        if not self._buffer:
+            return
+        start = time.perf_counter()
+        with self._conn:
+            self._conn.executemany(self._insert, self._buffer)
+        self.rows_written += len(self._buffer)
+        METRICS.count('write.rows', len(self._buffer))
+        METRICS.observe('write', time.perf_counter() - start)
+        logging.debug(f"{len(self._buffer)} 行を '{self.path.name}' に書き込みました。")
+        self._buffer.clear()
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            self._conn.close()
+
+def arrow_schema(columns: list):
+    """(列名, 型) のリストから Arrow のスキーマを作ります。"""
+    types = {'text': pa.string(), 'int': pa.int32(), 'date': pa.date32()}
+    return pa.schema([(name, types[column_type]) for name, column_type in columns])
+
+class ArrowSink(Sink):
+    """行を Parquet または Arrow IPC のファイルにレコードバッチ単位で書き込みます（pyarrow が必要です）。
+
+    出力ファイルは毎回作り直します。
+    """
+
+    def __init__(self, output_dir: Path, columns: list, format: str = 'parquet', buffer_rows: int = 1000,
+                 name: str = 'publications'):
+        if pa is None:
+            raise ImportError(f"{format} 形式で出力するには pyarrow をインストールしてください。")
+        self.schema = arrow_schema(columns)
+        self.types = [column_type for _, column_type in columns]
+        self.path = Path(output_dir) / f"{name}.{format}"
+        self.buffer_rows = buffer_rows
+        self.rows_written = 0
+        self._buffer = []
+        if format == 'parquet':
+            self._writer = pa.parquet.ParquetWriter(self.path, self.schema)
+        else:
+            self._writer = pa.ipc.new_file(self.path, self.schema)
+
+    def write(self, row: list):
+        self._buffer.append(typed_row(row, self.types))
+        if len(self._buffer) >= self.buffer_rows:
+            self.flush()
+
+    def flush(self):
+        if not self._buffer:
+            return
+        start = time.perf_counter()
+        columns = [pa.array(values, type=field.type)
+                   for values, field in zip(zip(*self._buffer), self.schema)]
+        self._writer.write_batch(pa.record_batch(columns, schema=self.schema))
+        self.rows_written += len(self._buffer)
+        METRICS.count('write.rows', len(self._buffer))
+        METRICS.observe('write', time.perf_counter() - start)
+        logging.debug(f"{len(self._buffer)} 行を '{self.path.name}' に書き込みました。")
+        self._buffer.clear()
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            self._writer.close()
+
+# 出力形式の一覧
+FORMATS = ['csv', 'sqlite', 'parquet', 'arrow']
+
+def open_sink(output_dir: Path, columns: list, format: str = 'csv', partition: str = 'number',
+              journal=None) -> Sink:
+    """出力形式に応じた Sink を返します。
+
+    columns は (列名, 型) のリストです。partition と journal は CSV の場合だけ使います。
+    """
+    if format == 'csv':
+        return CsvWriterPool(output_dir, partition, journal=journal)
+    if journal is not None:
+        raise ValueError("差分変換（マニフェスト）は CSV 出力でのみ使用できます。")
+    if format == 'sqlite':
+        return SqliteSink(output_dir, columns)
+    if format in ('parquet', 'arrow'):
+        return ArrowSink(output_dir, columns, format)
+    raise ValueError(f"出力形式 '{format}' は指定できません。{FORMATS} から選んでください。")
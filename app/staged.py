@@ -0,0 +1,293 @@
+import os
+import time
+import queue
+import logging
+import zipfile
+import argparse
+import threading
+import contextlib
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Callable, Iterable, Optional
+
+from metrics import setup_logging
+setup_logging('staged_pipeline.log')
+
+from unzip import iter_xml_infos, member_path, _record_member
+from encoding import _convert_pair, _record_pair
+from convert import (COLUMNS, add_conversion_arguments, add_field_limit_arguments, convert_file_with_stats,
+                     make_field_limit, record_conversion, resolve_engine)
+from pipeline import convert_batch, count_xml_members
+from sinks import open_sink
+from metrics import METRICS, console_stats
+
+# 中間ファイルの書き込みとエンコーディング変換を行うスレッド数の既定値
+DEFAULT_READERS = 2
+
+# キューの終わりを表す印
+_END = object()
+
+class _Stage:
+    """入力キューから取り出した要素を function で処理し、結果を出力キューに入れるスレッド群です。
+
+    function が None を返した要素は次の段階に渡しません。すべてのスレッドが終わると
+    出力キューに終わりの印を入れます。取り消された後も入力キューは終わりの印まで読み続け、
+    要素は処理せずに捨てます（上流のスレッドが満杯のキューで止まったままにならないようにします）。
+    """
+
+    def __init__(self, pipeline, name: str, function: Callable, inbox: queue.Queue,
+                 outbox: Optional[queue.Queue], threads: int):
+        self.pipeline = pipeline
+        self.name = name
+        self.function = function
+        self.inbox = inbox
+        self.outbox = outbox
+        self._lock = threading.Lock()
+        self._remaining = threads
+        self._done = 0
+        self._timer = None
+        self._threads = [threading.Thread(target=self._run, name=f'{name}-{i}', daemon=True)
+                         for i in range(threads)]
+
+    def next_count(self) -> int:
+        """この段階で処理を終えた件数を1増やして返します（進捗の通知に使います）。"""
+        with self._lock:
+            self._done += 1
+            return self._done
+
+    def start(self):
+        self._timer = METRICS.stage(self.name)
+        self._timer.__enter__()
+        for thread in self._threads:
+            thread.start()
+
+    def join(self):
+        for thread in self._threads:
+            thread.join()
+        if self._timer is not None:
+            self._timer.__exit__(None, None, None)
+            self._timer = None
+
+    def _run(self):
+        try:
+            while True:
+                item = self.inbox.get()
+                if item is _END:
+                    # 同じ段階の他のスレッドにも終わりを伝えます
+                    self.inbox.put(_END)
+                    break
+                if self.pipeline.cancelled.is_set():
+                    continue
+                try:
+                    result = self.function(item)
+                except Exception as e:
+                    self.pipeline.fail(self.name, e)
+                    continue
+                if result is not None and self.outbox is not None:
+                    self.outbox.put(result)
+        finally:
+            with self._lock:
+                self._remaining -= 1
+                last = self._remaining == 0
+            if last and self.outbox is not None:
+                self.outbox.put(_END)
+
+class StagedPipeline:
+    """ZIPの読み出し・中間ファイルの書き込みとエンコーディング変換・解析と抽出・出力の書き込みを
+    有界のキューでつなぎ、それぞれを並行に実行します。
+
+    ZIPは1つのスレッドが順に読み出し、readers 個のスレッドが extracted/ と utf8/ に書き込み、
+    workers 個のプロセスが解析と抽出を行い、1つのスレッドが出力に書き込みます。
+    これにより、ファイル N+1 の読み出し・ファイル N の解析・ファイル N-1 の書き込みが重なります。
+    キューの大きさは queue_size（省略時は workers の4倍）で、下流が遅い場合は上流が待つため、
+    メモリ使用量は一定に保たれます。direct を指定すると中間ファイルを作らず、
+    ZIPから読み出した内容をそのまま解析します（pipeline.zip_to_csv と同じ行を出力します）。
+
+    出力する行は extract_zip・copy_xml_and_chg_ipt_codec・xml_to_csv を順に実行した場合と同じですが、
+    行の順序は解析が終わった順になります。cancel を呼ぶと（別のスレッドからでもかまいません）、
+    各段階は残りの要素を処理せずに捨ててキューを空にし、run は False を返します。
+    それまでに書き込んだ行は出力に残ります。
+    max_field_chars と oversized は convert.xml_to_csv と同じです（書き出した本文は csv/fields/ に置きます）。
+    """
+
+    def __init__(self, zip_path: str, output_dir: str, direct: bool = False, readers: int = DEFAULT_READERS,
+                 workers: Optional[int] = None, queue_size: Optional[int] = None, partition: str = 'number',
+                 format: str = 'csv', members: Optional[Iterable[str]] = None, engine: Optional[str] = None,
+                 max_field_chars: Optional[int] = None, oversized: str = 'spill'):
+        self.zip_path = zip_path
+        self.output_dir = Path(output_dir)
+        self.direct = direct
+        self.readers = max(1, readers)
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.queue_size = queue_size or self.workers * 4
+        self.partition = partition
+        self.format = format
+        self.members = None if members is None else set(members)
+        self.engine = resolve_engine(engine)
+        self.field_limit = make_field_limit(max_field_chars, oversized, self.output_dir / 'csv')
+        self.cancelled = threading.Event()
+        self.error = None
+        self.total = None
+        self._executor = None
+
+    def cancel(self):
+        """変換を取り消します。"""
+        self.cancelled.set()
+
+    def fail(self, stage: str, error: Exception):
+        """段階の処理中に発生したエラーを記録し、残りの処理を取り消します。"""
+        logging.error(f"段階 '{stage}' の処理中にエラーが発生しました: {str(error)}")
+        if self.error is None:
+            self.error = error
+        self.cancelled.set()
+
+    def _read_members(self, zip_ref: zipfile.ZipFile, outbox: queue.Queue):
+        """ZIP内のXMLを順に読み出して outbox に入れます（入れ子のZIPは開いている間に読み出す必要があるため、
+        ZIPの読み出しは1つのスレッドで行います）。"""
+        try:
+            done = 0
+            for name, owner, info in iter_xml_infos(zip_ref):
+                if self.cancelled.is_set():
+                    break
+                if self.members is not None and name not in self.members:
+                    continue
+                start = time.perf_counter()
+                data = owner.read(info)
+                done += 1
+                _record_member(info, time.perf_counter() - start, done, self.total, None)
+                outbox.put((name, data))
+        except Exception as e:
+            self.fail('unzip', e)
+        finally:
+            outbox.put(_END)
+
+    def _transcode(self, item: tuple) -> Optional[tuple]:
+        """extracted/ に書き込んでUTF-8に変換し、(メンバーのパス, 変換後のファイル, バイト数) を返します。"""
+        name, data = item
+        # メンバー名は ZipFile.extract と同じく整え、出力ディレクトリの外に書き込まないようにします
+        extracted = Path(member_path(self.output_dir / 'extracted', name))
+        utf8_file = Path(member_path(self.output_dir / 'utf8', name))
+        extracted.parent.mkdir(parents=True, exist_ok=True)
+        utf8_file.parent.mkdir(parents=True, exist_ok=True)
+        extracted.write_bytes(data)
+        pair = (extracted, utf8_file)
+        result = _convert_pair(pair)
+        _record_pair(pair, result, self.transcode_stage.next_count(), self.total)
+        if not result[0]:
+            return None
+        return name, utf8_file, result[2]
+
+    def _convert(self, item: tuple) -> tuple:
+        """解析と抽出をワーカープロセスで行い、(メンバーのパス, バイト数, 行データ, stats) を返します。
+
+        この段階のスレッドはそれぞれ1件ずつワーカーに渡して結果を待つため、
+        処理中の件数はスレッド数（workers）までになります。
+        """
+        if self.direct:
+            name, data = item
+            size = len(data)
+            batch = [(name, data)]
+            if self._executor is None:
+                result, = convert_batch(batch, self.engine, self.field_limit)
+            else:
+                result, = self._executor.submit(convert_batch, batch, self.engine, self.field_limit).result()
+        else:
+            name, xml_file, size = item
+            if self._executor is None:
+                result = convert_file_with_stats(xml_file, self.engine, self.field_limit)
+            else:
+                result = self._executor.submit(convert_file_with_stats, xml_file, self.engine,
+                                               self.field_limit).result()
+        return (name, size, *result)
+
+    def _write(self, sink, item: tuple):
+        name, size, data, stats = item
+        record_conversion(name, size, data, stats, self.write_stage.next_count(), self.total)
+        if data:
+            sink.write(data)
+
+    def run(self) -> bool:
+        """変換を実行します。完了すれば True、取り消された場合は False を返します。
+
+        いずれかの段階でエラーが発生した場合は、キューを空にしてから例外を送出します。
+        """
+        csv_dir = self.output_dir / 'csv'
+        csv_dir.mkdir(parents=True, exist_ok=True)
+        try:
+            with zipfile.ZipFile(self.zip_path, 'r') as zip_ref, \
+                 open_sink(csv_dir, COLUMNS, self.format, self.partition) as sink, \
+                 contextlib.ExitStack() as stack:
+                self.total = count_xml_members(zip_ref) if self.members is None else len(self.members)
+                if self.workers > 1:
+                    self._executor = stack.enter_context(ProcessPoolExecutor(max_workers=self.workers))
+                    # fork で起動するワーカーは最初の submit でまとめて作られるため、
+                    # 段階のスレッドを起動する前に作っておきます
+                    self._executor.submit(int).result()
+                self._run_stages(zip_ref, sink)
+            if self.error is not None:
+                raise self.error
+        except zipfile.BadZipFile:
+            logging.error(f"ファイル '{self.zip_path}' は有効なZIPファイルではありません。")
+            raise
+        finally:
+            self._executor = None
+
+        for stage in ('unzip', 'transcode', 'convert', 'parse', 'extract', 'write'):
+            METRICS.log_summary(stage)
+        if self.cancelled.is_set():
+            logging.info(f"ZIPファイル '{self.zip_path}' の変換を取り消しました。")
+            return False
+        logging.info(f"ZIPファイル '{self.zip_path}' の変換が完了しました。出力した行数: {sink.rows_written}")
+        return True
+
+    def _run_stages(self, zip_ref: zipfile.ZipFile, sink):
+        read_queue = queue.Queue(self.queue_size)
+        convert_queue = queue.Queue(self.queue_size) if not self.direct else read_queue
+        write_queue = queue.Queue(self.queue_size)
+        stages = []
+        if not self.direct:
+            self.transcode_stage = _Stage(self, 'transcode', self._transcode, read_queue, convert_queue, self.readers)
+            stages.append(self.transcode_stage)
+        stages.append(_Stage(self, 'convert', self._convert, convert_queue, write_queue, self.workers))
+        self.write_stage = _Stage(self, 'write', lambda item: self._write(sink, item), write_queue, None, 1)
+        stages.append(self.write_stage)
+
+        reader = threading.Thread(target=self._read_members, args=(zip_ref, read_queue), name='unzip', daemon=True)
+        with METRICS.stage('unzip'):
+            for stage in stages:
+                stage.start()
+            reader.start()
+            try:
+                reader.join()
+            except KeyboardInterrupt:
+                # Ctrl+C でもキューを空にしてから終了します
+                self.cancel()
+                reader.join()
+                for stage in stages:
+                    stage.join()
+                raise
+        for stage in stages:
+            stage.join()
+
+def staged_zip_to_csv(zip_path: str, output_dir: str, **options) -> bool:
+    """StagedPipeline でZIPファイルを変換します。options は StagedPipeline と同じです。"""
+    return StagedPipeline(zip_path, output_dir, **options).run()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="ZIPの読み出し・エンコーディング変換・解析・書き込みを並行に実行してCSVに変換します。")
+    parser.add_argument('zip_file', help="入力ZIPファイル")
+    parser.add_argument('output_dir', help="出力ディレクトリ（extracted/・utf8/・csv/ を作成します）")
+    parser.add_argument('--direct', action='store_true', help="中間ファイル（extracted/・utf8/）を作らない")
+    parser.add_argument('--readers', type=int, default=DEFAULT_READERS,
+                        help=f"中間ファイルの書き込みとエンコーディング変換を行うスレッド数（既定: {DEFAULT_READERS}）")
+    parser.add_argument('--queue-size', type=int, help="段階の間のキューの大きさ（既定: workers の4倍）")
+    add_conversion_arguments(parser)
+    add_field_limit_arguments(parser)
+    args = parser.parse_args()
+
+    with console_stats() if args.stats else contextlib.nullcontext():
+        staged_zip_to_csv(args.zip_file, args.output_dir, direct=args.direct, readers=args.readers,
+                          workers=args.workers, queue_size=args.queue_size, partition=args.partition,
+                          format=args.format, engine=args.engine, max_field_chars=args.max_field_chars,
+                          oversized=args.oversized)
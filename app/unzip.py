@@ -1,18 +1,152 @@
-import zipfile
-import os
-import logging
-
-logging.basicConfig(filename='unzip.log', level=logging.INFO,
-                    format='%(asctime)s - %(levelname)s - %(message)s')
-
-def extract_zip(zip_path, extract_path):
-    try:
-        with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-            zip_ref.extractall(extract_path)
-        logging.info(f"Successfully extracted {zip_path} to {extract_path}")
-    except zipfile.BadZipFile:
-        logging.error(f"The file {zip_path} is not a valid ZIP file")
-        raise
-    except Exception as e:
-        logging.error(f"An error occurred while extracting {zip_path}: {str(e)}")
-        raise
\ No newline at end of file
+import zipfile
+import shutil
+import fnmatch
+import tempfile
+import os
+import time
+import logging
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from metrics import METRICS, setup_logging
+
+setup_logging('unzip.log')
+
+# extract_zip が既定で展開するメンバー
+DEFAULT_MEMBER_PATTERN = '*.xml'
+
+# ワーカープロセスごとに開いておくZIPファイル
+_worker_zip = None
+
+def _open_worker_zip(zip_path):
+    global _worker_zip
+    _worker_zip = zipfile.ZipFile(zip_path, 'r')
+
+def _extract_member(name, extract_path):
+    """ワーカープロセスで1つのメンバーを展開し、(メンバー名, 処理時間) を返します。"""
+    start = time.perf_counter()
+    try:
+        _worker_zip.extract(name, extract_path)
+    except FileExistsError:
+        # 他のワーカーが同じ親ディレクトリを同時に作成した場合はやり直します
+        _worker_zip.extract(name, extract_path)
+    return name, time.perf_counter() - start
+
+def _record_member(info, seconds, done, total, progress):
+    """展開した1メンバーを METRICS に記録し、進捗を通知します。"""
+    METRICS.count('unzip.files')
+    METRICS.count('unzip.bytes_in', info.compress_size)
+    METRICS.count('unzip.bytes_out', info.file_size)
+    METRICS.observe('unzip', seconds)
+    METRICS.progress('unzip', done, total, info.filename)
+    if progress is not None:
+        progress(done, total, info.filename)
+
+# Windows のファイル名に使えない文字（ZipFile.extract と同じく '_' に置き換えます）
+_WINDOWS_ILLEGAL = str.maketrans(':<>|"?*', '_______')
+
+def member_path(root, name):
+    """ZIPのメンバー名から root 以下の展開先のパスを作ります。
+
+    ZipFile.extract と同じく、ドライブ名と先頭の区切り文字、'.' と '..' の要素を取り除くため、
+    '../../x.xml' のような名前のメンバーでも root の外には書き込みません。
+    """
+    arcname = name.replace('/', os.path.sep)
+    if os.path.altsep:
+        arcname = arcname.replace(os.path.altsep, os.path.sep)
+    arcname = os.path.splitdrive(arcname)[1]
+    parts = [part for part in arcname.split(os.path.sep) if part not in ('', os.path.curdir, os.path.pardir)]
+    if os.path.sep == '\\':
+        parts = [part.translate(_WINDOWS_ILLEGAL).rstrip('.') for part in parts]
+        parts = [part for part in parts if part]
+    if not parts:
+        raise ValueError(f"メンバー名 '{name}' から展開先のパスを作れません。")
+    return os.path.join(root, *parts)
+
+def select_members(zip_ref, member_filter=DEFAULT_MEMBER_PATTERN):
+    """展開するメンバーの ZipInfo を返します。
+
+    member_filter はファイル名のパターン（大文字小文字を区別しません）か、ZipInfo を受け取って
+    真偽値を返す関数です。None を指定するとすべてのメンバーを対象にします。
+    """
+    infos = [info for info in zip_ref.infolist() if not info.is_dir()]
+    if member_filter is None:
+        return infos
+    if callable(member_filter):
+        return [info for info in infos if member_filter(info)]
+    pattern = member_filter.lower()
+    return [info for info in infos if fnmatch.fnmatchcase(info.filename.lower(), pattern)]
+
+def extract_zip(zip_path, extract_path, member_filter=DEFAULT_MEMBER_PATTERN, workers=None, progress=None):
+    """ZIPファイルから member_filter に一致するメンバーを展開します。
+
+    workers（省略時はCPUコア数）が2以上なら、ワーカープロセスがそれぞれ自分でZIPファイルを開き、
+    大きいメンバーから順に受け取って並列に展開します。progress を指定すると、
+    メンバーの展開が終わるたびに progress(完了数, 全体数, メンバー名) を呼びます。
+    展開したメンバー数・バイト数・処理時間は metrics.METRICS の 'unzip' 段階に記録します。
+    """
+    try:
+        with METRICS.stage('unzip'):
+            with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+                members = select_members(zip_ref, member_filter)
+                if workers is None:
+                    workers = os.cpu_count() or 1
+                if workers <= 1 or len(members) < 2:
+                    for done, info in enumerate(members, 1):
+                        start = time.perf_counter()
+                        zip_ref.extract(info, extract_path)
+                        _record_member(info, time.perf_counter() - start, done, len(members), progress)
+            if workers > 1 and len(members) >= 2:
+                members.sort(key=lambda info: info.compress_size, reverse=True)
+                infos = {info.filename: info for info in members}
+                with ProcessPoolExecutor(max_workers=workers, initializer=_open_worker_zip,
+                                         initargs=(zip_path,)) as executor:
+                    futures = [executor.submit(_extract_member, info.filename, extract_path) for info in members]
+                    for done, future in enumerate(as_completed(futures), 1):
+                        name, seconds = future.result()
+                        _record_member(infos[name], seconds, done, len(members), progress)
+        logging.info(f"Successfully extracted {len(members)} members of {zip_path} to {extract_path}")
+        METRICS.log_summary('unzip')
+    except zipfile.BadZipFile:
+        logging.error(f"The file {zip_path} is not a valid ZIP file")
+        raise
+    except Exception as e:
+        logging.error(f"An error occurred while extracting {zip_path}: {str(e)}")
+        raise
+
+# 入れ子のZIPをメモリ上に展開する上限（これを超えると一時ファイルに退避します）
+NESTED_ZIP_SPOOL_SIZE = 64 * 1024 * 1024
+
+def iter_xml_infos(zip_ref, prefix=''):
+    """ZIP内のXMLメンバーを (メンバーのパス, メンバーを含むZipFile, ZipInfo) として順に返します。
+
+    メンバーの内容は読み出さないため、呼び出し元で必要な分だけ開いて読めます
+    （ZipFile は次の要素を取り出すまで開いたままです）。入れ子のZIPも再帰的にたどり、
+    ディスクに書き出すのは NESTED_ZIP_SPOOL_SIZE を超える入れ子のZIPの一時ファイルだけです。
+    """
+    for info in zip_ref.infolist():
+        if info.is_dir():
+            continue
+        name = info.filename.lower()
+        if name.endswith('.xml'):
+            yield prefix + info.filename, zip_ref, info
+        elif name.endswith('.zip'):
+            with zip_ref.open(info) as member, \
+                 tempfile.SpooledTemporaryFile(max_size=NESTED_ZIP_SPOOL_SIZE) as spool:
+                shutil.copyfileobj(member, spool)
+                spool.seek(0)
+                try:
+                    with zipfile.ZipFile(spool) as nested:
+                        yield from iter_xml_infos(nested, f"{prefix}{info.filename}/")
+                except zipfile.BadZipFile:
+                    logging.error(f"The nested file {prefix}{info.filename} is not a valid ZIP file")
+
+def iter_xml_members(zip_ref, prefix='', names=None):
+    """ZIP内のXMLメンバーを (メンバーのパス, 内容のバイト列) として順に返します。
+
+    入れ子のZIPも再帰的にたどります。names（メンバーのパスの集合）を指定すると、
+    それ以外のメンバーは読み出さずに飛ばします。
+    """
+    for name, owner, info in iter_xml_infos(zip_ref, prefix):
+        if names is not None and name not in names:
+            continue
+        with owner.open(info) as member:
+            yield name, member.read()
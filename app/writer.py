@@ -0,0 +1,143 @@
+import os
+import csv
+import time
+import logging
+from collections import OrderedDict
+from pathlib import Path
+from metrics import METRICS
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# 出力ファイルの分け方（行データから出力ファイル名を決める関数）
+PARTITIONS = {
+    'number': lambda row: row[3],          # 公開番号ごと（従来どおり1件1ファイル）
+    'date': lambda row: row[4],            # 公開日ごと
+    'month': lambda row: row[4][:6],       # 公開月ごと
+    'single': lambda row: 'publications',  # 1ファイルにまとめる
+}
+
+def default_max_open_files() -> int:
+    """同時に開いておくファイル数の既定値を、プロセスのファイル記述子の上限から決めます。"""
+    if resource is None:
+        return 128
+    soft, _ = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft == resource.RLIM_INFINITY:
+        return 128
+    return max(1, min(128, soft // 4))
+
+class Sink:
+    """抽出した行の出力先の基底クラスです。
+
+    write で1行ずつ受け取り、close ですべて書き出します。CSV以外の出力先は sinks.py にあります。
+    """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def write(self, row: list):
+        raise NotImplementedError
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.flush()
+
+class CsvWriterPool(Sink):
+    """CSVファイルのハンドルを開いたまま保持し、行をまとめて書き込みます。
+
+    行は buffer_rows 件たまるまでメモリに保持し、flush でファイルごとにまとめて書き込みます。
+    開いているハンドルは最近使った順に管理し、max_open_files を超えたら古いものから閉じます。
+    journal（manifest.Manifest）を指定すると、flush の前後で書き込み先と書き込み後の
+    ファイルサイズを通知します。書き込んだ行数・バイト数と flush の処理時間は
+    metrics.METRICS の 'write' 段階に記録します。
+    """
+
+    def __init__(self, output_dir: Path, partition: str = 'number', max_open_files: int = None,
+                 buffer_rows: int = 500, encoding: str = 'cp932', journal=None):
+        if partition not in PARTITIONS:
+            raise ValueError(f"出力の分割方法 '{partition}' は指定できません。{list(PARTITIONS)} から選んでください。")
+        self.output_dir = Path(output_dir)
+        self.partition_key = PARTITIONS[partition]
+        self.max_open_files = max_open_files or default_max_open_files()
+        self.buffer_rows = buffer_rows
+        self.encoding = encoding
+        self.journal = journal
+        self.rows_written = 0
+        self._handles = OrderedDict()
+        self._buffers = {}
+        self._buffered = 0
+
+    def write(self, row: list):
+        """1行を書き込み待ちに追加します。"""
+        self._buffers.setdefault(self.partition_key(row), []).append(row)
+        self._buffered += 1
+        if self._buffered >= self.buffer_rows:
+            self.flush()
+
+    def flush(self):
+        """書き込み待ちの行をファイルごとにまとめて書き込みます。"""
+        if not self._buffered:
+            if self.journal is not None:
+                self.journal.commit({})
+            return
+        start = time.perf_counter()
+        if self.journal is not None:
+            self.journal.prepare(self._buffers)
+        written = 0
+        bytes_out = 0
+        sizes = {}
+        failed_rows = []
+        for name, rows in self._buffers.items():
+            f, writer = self._open(name)
+            size_before = os.fstat(f.fileno()).st_size
+            for row in rows:
+                try:
+                    writer.writerow(row)
+                    written += 1
+                except Exception as e:
+                    # 行単位で encode してから書き込むため、失敗した行は出力されません
+                    failed_rows.append(row)
+                    logging.error(f"CSVファイル '{f.name}' への書き込み中にエラーが発生しました"
+                                  f"（公開番号: {row[3]}）: {str(e)}")
+            f.flush()
+            sizes[name] = os.fstat(f.fileno()).st_size
+            bytes_out += sizes[name] - size_before
+        if self.journal is not None:
+            self.journal.commit(sizes, failed_rows)
+        self.rows_written += written
+        METRICS.count('write.rows', written)
+        METRICS.count('write.bytes_out', bytes_out)
+        if failed_rows:
+            METRICS.count('write.errors', len(failed_rows))
+        METRICS.observe('write', time.perf_counter() - start)
+        logging.debug(f"{written} 行をCSVファイルに書き込みました。（ファイル数: {len(self._buffers)}）")
+        self._buffers.clear()
+        self._buffered = 0
+
+    def close(self):
+        """書き込み待ちの行を書き込み、すべてのファイルを閉じます。"""
+        try:
+            self.flush()
+        finally:
+            while self._handles:
+                _, (f, _) = self._handles.popitem(last=False)
+                f.close()
+
+    def _open(self, name: str):
+        if name in self._handles:
+            self._handles.move_to_end(name)
+            return self._handles[name]
+        if len(self._handles) >= self.max_open_files:
+            _, (f, _) = self._handles.popitem(last=False)
+            f.close()
+        f = (self.output_dir / f"{name}.csv").open('a', newline='', encoding=self.encoding)
+        handle = (f, csv.writer(f, lineterminator='\n'))
+        self._handles[name] = handle
+        return handle
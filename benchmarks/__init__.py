@@ -0,0 +1,11 @@
+"""変換処理のベンチマーク集です。
+
+app/ 以下のモジュールは `from unzip import extract_zip` のように直接 import しているため、
+ここで app ディレクトリを sys.path に追加します。
+"""
+import sys
+from pathlib import Path
+
+APP_DIR = Path(__file__).resolve().parent.parent / 'app'
+if str(APP_DIR) not in sys.path:
+    sys.path.insert(0, str(APP_DIR))
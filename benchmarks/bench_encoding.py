@@ -0,0 +1,74 @@
+"""EUC-JP→UTF-8 変換（copy_and_convert_encoding）の新旧実装のスループットを比較します。
+
+使用方法: python -m benchmarks.bench_encoding [--count N] [--paragraphs N] [--workers N]
+"""
+import argparse
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from benchmarks.corpus import write_corpus
+from encoding import copy_and_convert_encoding, copy_xml_and_chg_ipt_codec
+
+def legacy_copy_and_convert_encoding(input_file: Path, output_file: Path):
+    """ファイル全体を str として読み込んでいた旧実装です（比較用）。"""
+    with open(input_file, 'r', encoding='euc_jp') as f_in, \
+         open(output_file, 'w', encoding='utf_8') as f_out:
+        content = f_in.read()
+        converted_content = content.replace(
+            '<?xml version="1.0" encoding="EUC-JP"?>',
+            '<?xml version="1.0" encoding="UTF-8"?>'
+        )
+        f_out.write(converted_content)
+
+def _run(func, paths: list, out_dir: Path) -> float:
+    out_dir.mkdir(parents=True, exist_ok=True)
+    start = time.perf_counter()
+    for path in paths:
+        func(path, out_dir / path.name)
+    return time.perf_counter() - start
+
+def _peak_memory(func, path: Path, out_dir: Path) -> int:
+    tracemalloc.start()
+    func(path, out_dir / path.name)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--count', type=int, default=200, help='生成する文書数')
+    parser.add_argument('--paragraphs', type=int, default=200, help='実施形態の段落数')
+    parser.add_argument('--workers', type=int, default=4, help='ディレクトリ変換の並列数')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        paths = write_corpus(tmp / 'in', args.count, encoding='euc_jp', paragraphs=args.paragraphs)
+        megabytes = sum(path.stat().st_size for path in paths) / 1024 / 1024
+
+        legacy = _run(legacy_copy_and_convert_encoding, paths, tmp / 'legacy')
+        current = _run(copy_and_convert_encoding, paths, tmp / 'current')
+        for path in paths:
+            if (tmp / 'legacy' / path.name).read_bytes() != (tmp / 'current' / path.name).read_bytes():
+                raise SystemExit(f"出力が一致しません: {path.name}")
+
+        start = time.perf_counter()
+        copy_xml_and_chg_ipt_codec(str(tmp / 'in'), str(tmp / 'parallel'), workers=args.workers)
+        parallel = time.perf_counter() - start
+
+        largest = max(paths, key=lambda path: path.stat().st_size)
+        largest_size = largest.stat().st_size
+        legacy_peak = _peak_memory(legacy_copy_and_convert_encoding, largest, tmp / 'legacy')
+        current_peak = _peak_memory(copy_and_convert_encoding, largest, tmp / 'current')
+
+    print(f"input   : {len(paths)} files, {megabytes:.1f} MB")
+    print(f"legacy  : {megabytes / legacy:.1f} MB/s")
+    print(f"current : {megabytes / current:.1f} MB/s")
+    print(f"parallel: {megabytes / parallel:.1f} MB/s (workers={args.workers}, directory mode)")
+    print(f"peak memory for {largest_size / 1024:.0f} KB file: "
+          f"legacy {legacy_peak / 1024:.0f} KB, current {current_peak / 1024:.0f} KB")
+
+if __name__ == '__main__':
+    main()
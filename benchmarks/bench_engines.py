@@ -0,0 +1,90 @@
+"""解析エンジン（etree・lxml）の出力が一致することを確認し、処理時間を比較します。
+
+合成コーパス（UTF-8・EUC-JP）に加えて、コメント・CDATA・文字参照・対象外の公開種別・
+テーマコードの欠落など境界的な文書も変換し、両エンジンの行データ（対象外・エラーの判定を含む）を
+1件ずつ比較します。lxml がインストールされている必要があります。
+
+使用方法: python -m benchmarks.bench_engines [--count N] [--paragraphs N] [--repeat N]
+"""
+import argparse
+import time
+
+from benchmarks.corpus import ENCODING_NAMES, generate_document
+from convert import lxml_etree
+from pipeline import convert_member
+
+def _edge_documents() -> list:
+    """(名前, XMLの内容) のリストを返します。"""
+    base = generate_document(0, kind='公開特許公報(A)')
+    cases = {
+        'comment': base.replace('<abstract><p num="0000">', '<abstract><!-- 注記 --><p num="0000"><!-- x -->'),
+        'processing-instruction': base.replace('<claims>', '<?page 3?><claims><?page 4?>'),
+        'cdata': base.replace('<invention-title>', '<invention-title><![CDATA[A&B <処理>]]>'),
+        'character-reference': base.replace('<invention-title>', '<invention-title>&amp;&#x30A2;&lt;'),
+        'out-of-scope-kind': generate_document(1, kind='特許公報(B2)'),
+        # バイト列での公開種別の事前判定が使えず、解析後に判定される文書
+        'out-of-scope-kind-with-comment': generate_document(2, kind='特許公報(B2)')
+                                          .replace('<document-id>', '<document-id><!-- 注記 -->', 1),
+        'escaped-kind': base.replace('<kind>公開特許公報(A)</kind>', '<kind>公開特許公報&#x28;A)</kind>'),
+        'no-theme-code': base.replace('<jp:theme-code-info><jp:theme-code>5B098</jp:theme-code></jp:theme-code-info>', ''),
+        'no-f-term': base.replace('<jp:f-term-info><jp:f-term>5B098AA10</jp:f-term>\n'
+                                  '<jp:f-term>5B098GA04</jp:f-term></jp:f-term-info>', ''),
+        'no-publication-reference': base.replace('<publication-reference>', '<publication-ref>')
+                                        .replace('</publication-reference>', '</publication-ref>'),
+        'empty-kind': base.replace('<kind>公開特許公報(A)</kind>', '<kind></kind>'),
+        'malformed': base[:len(base) // 2],
+    }
+    return [(name, document) for name, document in cases.items()]
+
+def _members(count: int, paragraphs: int) -> list:
+    """(名前, XMLのバイト列) のリストを UTF-8 と EUC-JP の両方で返します。"""
+    documents = []
+    # 出願人などの人数を 0〜14 で変え、列の欠落や13人目以降も含めて比較します。
+    for index in range(count):
+        n = index % 15
+        documents.append((f'doc{index:06d}', generate_document(
+            index, applicants=n, agents=(n + 3) % 15, inventors=(n + 7) % 15, paragraphs=paragraphs)))
+    documents += _edge_documents()
+    members = []
+    for encoding, declared in ENCODING_NAMES.items():
+        declaration = f'<?xml version="1.0" encoding="{declared}"?>\n'
+        members += [(f'{encoding}/{name}.xml', (declaration + document).encode(encoding))
+                    for name, document in documents]
+    return members
+
+def _time(engine: str, members: list, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for name, data in members:
+            convert_member(name, data, engine=engine)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--count', type=int, default=300, help='生成する文書数（エンコーディングごと）')
+    parser.add_argument('--paragraphs', type=int, default=40, help='実施形態の段落数')
+    parser.add_argument('--repeat', type=int, default=3, help='計測の繰り返し回数（最良値を採用）')
+    args = parser.parse_args()
+    if lxml_etree is None:
+        raise SystemExit("lxml がインストールされていません。")
+
+    members = _members(args.count, args.paragraphs)
+    outcomes = {'rows': 0, 'skipped': 0, 'errors': 0}
+    for name, data in members:
+        expected = convert_member(name, data, engine='etree')
+        actual = convert_member(name, data, engine='lxml')
+        if actual != expected:
+            raise SystemExit(f"出力が一致しません: {name}")
+        outcomes['errors' if expected is None else 'rows' if expected else 'skipped'] += 1
+
+    etree = _time('etree', members, args.repeat)
+    lxml = _time('lxml', members, args.repeat)
+    print(f"documents: {len(members)} ({', '.join(f'{key}={value}' for key, value in outcomes.items())})")
+    print(f"etree   : {etree:.3f}s ({len(members) / etree:.1f} docs/s)")
+    print(f"lxml    : {lxml:.3f}s ({len(members) / lxml:.1f} docs/s)")
+    print(f"speedup : {etree / lxml:.2f}x")
+
+if __name__ == '__main__':
+    main()
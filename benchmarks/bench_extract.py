@@ -0,0 +1,87 @@
+"""extract_data の新旧実装を合成コーパスで比較します。
+
+合成コーパスでは新旧の出力が一致することを、EDGE_CASES の文書では意図した違いだけがあることを確認します。
+
+使用方法: python -m benchmarks.bench_extract [--count N] [--paragraphs N] [--repeat N]
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from xml.etree.ElementTree import fromstring
+
+from benchmarks.corpus import generate_document, write_corpus
+from benchmarks.legacy_extract import legacy_extract_data
+from convert import COLUMN_NAMES, extract_data, lxml_etree, parse_xml
+
+# 境界的な文書：(説明, 置き換える文字列, 置き換え後の文字列, {旧実装と値が異なる列: 新実装の値})
+# 新実装は列のパスに文書の順序で最初に一致した要素を使います。旧実装の findtext は
+# './/parties/...' をまず parties ごとに探すため、入れ子の parties では外側の要素を優先していました。
+EDGE_CASES = [
+    ('技術分野の中の特許文献', '<technical-field>',
+     '<technical-field><patent-literature><p>入れ子の特許文献</p></patent-literature>', {}),
+    ('入れ子の parties', '<parties>\n',
+     '<parties>\n<parties><jp:applicants-agents-article><jp:applicants-agents sequence="1">'
+     '<applicant sequence="1"><addressbook lang="ja"><name>入れ子の出願人</name></addressbook></applicant>'
+     '</jp:applicants-agents></jp:applicants-agents-article></parties>\n',
+     {'出願人1_名称': '入れ子の出願人'}),
+]
+
+def check_edge_cases():
+    """EDGE_CASES の文書で、旧実装との違いが期待どおりで、etree と lxml の結果が同じことを確認します。"""
+    base = generate_document(1, kind='公開特許公報(A)')
+    for label, old, new, expected in EDGE_CASES:
+        data = base.replace(old, new, 1).encode('utf_8')
+        root = fromstring(data)
+        rows = {'etree': extract_data(root)}
+        if lxml_etree is not None:
+            rows['lxml'] = extract_data(lxml_etree.fromstring(data))
+        legacy = dict(zip(COLUMN_NAMES, legacy_extract_data(root)))
+        for engine, row in rows.items():
+            for name, value in zip(COLUMN_NAMES, row):
+                want = expected.get(name, legacy[name])
+                if value != want:
+                    raise SystemExit(f"{label}（{engine}）: 列 '{name}' が {want!r} ではなく {value!r} です")
+    print(f"edge cases: {len(EDGE_CASES)} ({', '.join(label for label, *_ in EDGE_CASES)})")
+
+def _time(func, roots: list, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for root in roots:
+            func(root)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--count', type=int, default=200, help='生成する文書数')
+    parser.add_argument('--paragraphs', type=int, default=40, help='実施形態の段落数')
+    parser.add_argument('--repeat', type=int, default=3, help='計測の繰り返し回数（最良値を採用）')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        roots = []
+        # 出願人などの人数を 0〜14 で変え、列の欠落や13人目以降も含めて比較します。
+        for n in range(15):
+            paths = write_corpus(Path(tmp) / str(n), max(1, args.count // 15), seed=n,
+                                 applicants=n, agents=(n + 3) % 15, inventors=(n + 7) % 15,
+                                 paragraphs=args.paragraphs)
+            roots.extend(parse_xml(path) for path in paths)
+
+    for root in roots:
+        if extract_data(root) != legacy_extract_data(root):
+            raise SystemExit(f"出力が一致しません: {root.findtext('.//publication-reference/document-id/doc-number')}")
+
+    check_edge_cases()
+
+    legacy = _time(legacy_extract_data, roots, args.repeat)
+    current = _time(extract_data, roots, args.repeat)
+    print(f"documents: {len(roots)}")
+    print(f"legacy  : {legacy:.3f}s ({len(roots) / legacy:.1f} docs/s)")
+    print(f"current : {current:.3f}s ({len(roots) / current:.1f} docs/s)")
+    print(f"speedup : {legacy / current:.2f}x")
+
+if __name__ == '__main__':
+    main()
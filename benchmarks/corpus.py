@@ -0,0 +1,172 @@
+"""ベンチマーク用の合成 JPO 公報XMLを生成します。
+
+extract_data が参照する要素（書誌事項・出願人・代理人・発明者・本文）をすべて含む
+文書を作成します。出願人などの人数や本文の段落数は引数で変更できます。
+
+使用方法: python -m benchmarks.corpus <出力先> [--count N] [--zip] [--nested N] ...
+"""
+import io
+import random
+import zipfile
+import argparse
+from pathlib import Path
+from xml.sax.saxutils import escape
+
+KINDS = ['公開特許公報(A)', '公表特許公報(A)', '特許公報(B2)', '再公表特許(A1)']
+
+_SENTENCE = '本発明は、装置の処理速度を向上させることを目的とし、制御部が記憶部のデータを読み出して演算を行うものである。'
+
+def _paragraphs(rng: random.Random, count: int, start: int = 1) -> str:
+    return ''.join(
+        f'<p num="{start + i:04d}">【{start + i:04d}】\n{_SENTENCE * rng.randint(1, 4)}\n</p>\n'
+        for i in range(count))
+
+def _addressbook(name: str, address: str = None, registered_number: str = None, lang: str = 'ja') -> str:
+    parts = [f'<addressbook lang="{lang}">' if lang else '<addressbook>']
+    if registered_number is not None:
+        parts.append(f'<registered-number>{registered_number}</registered-number>')
+    parts.append(f'<name>{escape(name)}</name>')
+    if address is not None:
+        parts.append(f'<address><text>{escape(address)}</text></address>')
+    parts.append('</addressbook>')
+    return ''.join(parts)
+
+def generate_document(index: int, applicants: int = 2, agents: int = 2, inventors: int = 3,
+                      paragraphs: int = 20, kind: str = None, seed: int = 0) -> str:
+    """合成した公報XMLを文字列で返します（XML宣言は含みません）。"""
+    rng = random.Random(seed * 1000003 + index)
+    kind = kind or rng.choice(KINDS)
+    year = 2020 + index % 5
+    doc_number = f'{year}{index:06d}'
+    pub_date = f'{year}{rng.randint(1, 12):02d}{rng.randint(1, 28):02d}'
+
+    applicant_xml = ''.join(
+        f'<applicant sequence="{n}" jp:kind="applicant">'
+        + _addressbook(f'株式会社サンプル{n}', f'東京都千代田区霞が関{n}丁目', f'{rng.randint(0, 999999999):09d}')
+        + _addressbook(f'Sample Corp {n}', 'Tokyo', lang='en')
+        + '</applicant>'
+        for n in range(1, applicants + 1))
+    agent_xml = ''.join(
+        f'<agent sequence="{n}" jp:kind="representative"><jp:agent-type>patent-attorney</jp:agent-type>'
+        + _addressbook(f'弁理士 代理{n}', registered_number=f'{rng.randint(0, 999999):06d}', lang=None)
+        + '</agent>'
+        for n in range(1, agents + 1))
+    inventor_xml = ''.join(
+        f'<inventor sequence="{n}">'
+        + _addressbook(f'発明 太郎{n}', f'大阪府大阪市北区梅田{n}丁目', lang=None)
+        + '</inventor>'
+        for n in range(1, inventors + 1))
+    claims_xml = ''.join(
+        f'<claim num="{n}"><claim-text>【請求項{n}】\n{_SENTENCE * rng.randint(1, 3)}\n</claim-text></claim>\n'
+        for n in range(1, max(1, paragraphs // 4) + 1))
+
+    return (
+        f'<jp:patent-publication xmlns:jp="http://www.jpo.go.jp" lang="ja" country="JP" '
+        f'kind-of-jp="A" kind-of-st16="A">\n'
+        '<bibliographic-data lang="ja" country="JP">\n'
+        f'<publication-reference><document-id><country>JP</country><doc-number>{doc_number}</doc-number>'
+        f'<kind>{kind}</kind><date>{pub_date}</date></document-id></publication-reference>\n'
+        f'<application-reference appl-type="patent"><document-id><country>JP</country>'
+        f'<doc-number>{year - 2}{index:06d}</doc-number><date>{year - 2}0401</date></document-id>'
+        '</application-reference>\n'
+        f'<invention-title>合成文書{index}の処理装置</invention-title>\n'
+        '<classification-ipc><main-clsf>G06F   9/50        20060101AFI20210101BHJP</main-clsf></classification-ipc>\n'
+        '<classification-national><country>JP</country>\n<main-clsf>G06F    9/50     150A</main-clsf>\n'
+        '<further-clsf>G06F    9/46     462Z</further-clsf>\n</classification-national>\n'
+        '<jp:theme-code-info><jp:theme-code>5B098</jp:theme-code></jp:theme-code-info>\n'
+        '<jp:f-term-info><jp:f-term>5B098AA10</jp:f-term>\n<jp:f-term>5B098GA04</jp:f-term></jp:f-term-info>\n'
+        f'<number-of-claims>{max(1, paragraphs // 4)}</number-of-claims>\n'
+        f'<jp:total-pages>{rng.randint(5, 60)}</jp:total-pages>\n'
+        '<parties>\n<jp:applicants-agents-article><jp:applicants-agents sequence="1">'
+        f'{applicant_xml}{agent_xml}</jp:applicants-agents></jp:applicants-agents-article>\n'
+        f'<inventors>{inventor_xml}</inventors>\n</parties>\n'
+        '</bibliographic-data>\n'
+        f'<abstract><p num="0000">【課題】\n{_SENTENCE}\n【解決手段】\n{_SENTENCE}\n【選択図】図1</p></abstract>\n'
+        '<description>\n'
+        f'<technical-field>{_paragraphs(rng, 1, 1)}</technical-field>\n'
+        f'<background-art>{_paragraphs(rng, 2, 2)}</background-art>\n'
+        '<citation-list><patent-literature><p num="0004"><patcit num="1"><text>特開2019-000001号公報</text>'
+        '</patcit></p></patent-literature>\n'
+        '<non-patent-literature><p num="0005"><nplcit num="1"><text>サンプル論文</text></nplcit></p>'
+        '</non-patent-literature></citation-list>\n'
+        '<summary-of-invention>'
+        f'<tech-problem>{_paragraphs(rng, 1, 6)}</tech-problem>'
+        f'<tech-solution>{_paragraphs(rng, 2, 7)}</tech-solution>'
+        f'<advantageous-effects>{_paragraphs(rng, 1, 9)}</advantageous-effects>'
+        '</summary-of-invention>\n'
+        f'<description-of-drawings>{_paragraphs(rng, 2, 10)}</description-of-drawings>\n'
+        f'<description-of-embodiments>{_paragraphs(rng, paragraphs, 12)}</description-of-embodiments>\n'
+        f'<industrial-applicability>{_paragraphs(rng, 1, 12 + paragraphs)}</industrial-applicability>\n'
+        '</description>\n'
+        f'<claims>\n{claims_xml}</claims>\n'
+        '</jp:patent-publication>\n'
+    )
+
+# 書き出すエンコーディングと、XML宣言に記載する名前
+ENCODING_NAMES = {'utf_8': 'UTF-8', 'euc_jp': 'EUC-JP'}
+
+def write_corpus(directory, count: int, encoding: str = 'utf_8', **options) -> list:
+    """count 件の合成公報をXMLファイルとして directory に書き出し、パスの一覧を返します。
+
+    encoding には 'utf_8' か 'euc_jp'（JPOの配布データと同じ形式）を指定します。
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    declaration = f'<?xml version="1.0" encoding="{ENCODING_NAMES[encoding]}"?>\n'
+    paths = []
+    for index in range(count):
+        path = directory / f'doc{index:06d}.xml'
+        path.write_bytes((declaration + generate_document(index, **options)).encode(encoding))
+        paths.append(path)
+    return paths
+
+def write_zip_corpus(zip_path, count: int, encoding: str = 'euc_jp', nested: int = 0, **options) -> Path:
+    """count 件の合成公報をZIPファイルにまとめて書き出します。
+
+    JPOの一括ダウンロードデータと同様にXMLは既定で EUC-JP とし、画像の代わりにダミーの
+    TIFFファイルも含めます。nested を指定すると、その件数ごとに入れ子のZIPにまとめます。
+    """
+    zip_path = Path(zip_path)
+    zip_path.parent.mkdir(parents=True, exist_ok=True)
+    declaration = f'<?xml version="1.0" encoding="{ENCODING_NAMES[encoding]}"?>\n'
+
+    def member(index: int) -> tuple:
+        name = f'DOCUMENT/P/{index:06d}/{index:06d}.xml'
+        return name, (declaration + generate_document(index, **options)).encode(encoding)
+
+    with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zip_ref:
+        if nested:
+            for start in range(0, count, nested):
+                buffer = io.BytesIO()
+                with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as inner:
+                    for index in range(start, min(count, start + nested)):
+                        inner.writestr(*member(index))
+                zip_ref.writestr(f'DOCUMENT/P/{start:06d}.zip', buffer.getvalue())
+        else:
+            for index in range(count):
+                zip_ref.writestr(*member(index))
+                zip_ref.writestr(f'DOCUMENT/P/{index:06d}/{index:06d}-001.tif', b'II*\x00' + bytes(2048))
+    return zip_path
+
+def main():
+    parser = argparse.ArgumentParser(description="ベンチマーク用の合成公報XMLを生成します。")
+    parser.add_argument('output', help="出力先（--zip の場合はZIPファイル、それ以外はディレクトリ）")
+    parser.add_argument('--count', type=int, default=1000, help="文書数")
+    parser.add_argument('--applicants', type=int, default=2, help="出願人の数")
+    parser.add_argument('--agents', type=int, default=2, help="代理人の数")
+    parser.add_argument('--inventors', type=int, default=3, help="発明者の数")
+    parser.add_argument('--paragraphs', type=int, default=20, help="実施形態の段落数（本文の大きさ）")
+    parser.add_argument('--encoding', choices=list(ENCODING_NAMES), default='euc_jp', help="XMLのエンコーディング")
+    parser.add_argument('--zip', action='store_true', help="ZIPファイルにまとめる")
+    parser.add_argument('--nested', type=int, default=0, help="入れ子のZIP1つあたりの文書数（--zip と併用）")
+    args = parser.parse_args()
+
+    options = dict(applicants=args.applicants, agents=args.agents, inventors=args.inventors,
+                   paragraphs=args.paragraphs)
+    if args.zip:
+        write_zip_corpus(args.output, args.count, args.encoding, args.nested, **options)
+    else:
+        write_corpus(args.output, args.count, args.encoding, **options)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,212 @@
+"""変換の各段階と全体の処理時間を計測し、結果をJSONで出力します。
+
+段階（unzip・transcode・parse・extract・write）と全体（順に実行・ZIPから直接・並行に実行）を
+それぞれ新しいプロセスで実行し、処理時間・files/s・MB/s・最大RSSを記録します。バージョン間の比較に使えるよう、
+結果は機械可読なJSONとして出力します。
+
+使用方法: python -m benchmarks.suite [--count N] [--paragraphs N] [--workers N] [--output result.json]
+"""
+import os
+import sys
+import json
+import time
+import zipfile
+import platform
+import argparse
+import tempfile
+import subprocess
+import multiprocessing
+from datetime import datetime, timezone
+from pathlib import Path
+
+from benchmarks.corpus import write_zip_corpus
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+STAGES = ['unzip', 'transcode', 'parse', 'extract', 'write', 'end_to_end_staged', 'end_to_end_direct',
+          'end_to_end_overlapped']
+
+# 各段階の入力を作るために先に実行が必要な段階
+PREREQUISITES = {'transcode': ['unzip'], 'parse': ['unzip', 'transcode'],
+                 'extract': ['unzip', 'transcode'], 'write': ['unzip', 'transcode']}
+
+def _peak_rss_kb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+def _xml_files(directory: Path) -> list:
+    return sorted(directory.glob('**/*.xml'))
+
+def _total_bytes(paths: list) -> int:
+    return sum(path.stat().st_size for path in paths)
+
+def _stage_unzip(work: Path, workers: int) -> tuple:
+    from unzip import extract_zip
+    zip_path = work / 'corpus.zip'
+    start = time.perf_counter()
+    extract_zip(str(zip_path), str(work / 'extracted'), workers=workers)
+    elapsed = time.perf_counter() - start
+    return elapsed, len(_xml_files(work / 'extracted')), zip_path.stat().st_size
+
+def _stage_transcode(work: Path, workers: int) -> tuple:
+    from encoding import copy_xml_and_chg_ipt_codec
+    paths = _xml_files(work / 'extracted')
+    start = time.perf_counter()
+    copy_xml_and_chg_ipt_codec(str(work / 'extracted'), str(work / 'utf8'), workers=workers)
+    elapsed = time.perf_counter() - start
+    return elapsed, len(paths), _total_bytes(paths)
+
+def _parse_all(paths: list) -> list:
+    from convert import TARGET_KINDS, parse_xml
+    return [parse_xml(path, TARGET_KINDS) for path in paths]
+
+def _stage_parse(work: Path, workers: int) -> tuple:
+    paths = _xml_files(work / 'utf8')
+    start = time.perf_counter()
+    _parse_all(paths)
+    elapsed = time.perf_counter() - start
+    return elapsed, len(paths), _total_bytes(paths)
+
+def _stage_extract(work: Path, workers: int) -> tuple:
+    from convert import extract_data
+    paths = _xml_files(work / 'utf8')
+    roots = [root for root in _parse_all(paths) if root is not None]
+    start = time.perf_counter()
+    for root in roots:
+        extract_data(root)
+    elapsed = time.perf_counter() - start
+    return elapsed, len(roots), None
+
+def _stage_write(work: Path, workers: int) -> tuple:
+    from convert import extract_data
+    from writer import CsvWriterPool
+    paths = _xml_files(work / 'utf8')
+    rows = [extract_data(root) for root in _parse_all(paths) if root is not None]
+    output = work / 'write'
+    output.mkdir()
+    start = time.perf_counter()
+    with CsvWriterPool(output) as pool:
+        for row in rows:
+            pool.write(row)
+    elapsed = time.perf_counter() - start
+    return elapsed, len(rows), _total_bytes(list(output.glob('*.csv')))
+
+def _stage_end_to_end_staged(work: Path, workers: int) -> tuple:
+    from unzip import extract_zip
+    from encoding import copy_xml_and_chg_ipt_codec
+    from convert import xml_to_csv
+    zip_path = work / 'corpus.zip'
+    output = work / 'staged'
+    start = time.perf_counter()
+    extract_zip(str(zip_path), str(output / 'extracted'), workers=workers)
+    copy_xml_and_chg_ipt_codec(str(output / 'extracted'), str(output / 'utf8'), workers=workers)
+    xml_to_csv(str(output / 'utf8'), str(output / 'csv'), workers=workers)
+    elapsed = time.perf_counter() - start
+    return elapsed, len(_xml_files(output / 'extracted')), zip_path.stat().st_size
+
+def _stage_end_to_end_direct(work: Path, workers: int) -> tuple:
+    from pipeline import zip_to_csv
+    from unzip import iter_xml_members
+    zip_path = work / 'corpus.zip'
+    start = time.perf_counter()
+    zip_to_csv(str(zip_path), str(work / 'direct'), workers=workers)
+    elapsed = time.perf_counter() - start
+    with zipfile.ZipFile(zip_path) as zip_ref:
+        files = sum(1 for _ in iter_xml_members(zip_ref))
+    return elapsed, files, zip_path.stat().st_size
+
+def _stage_end_to_end_overlapped(work: Path, workers: int) -> tuple:
+    from staged import staged_zip_to_csv
+    zip_path = work / 'corpus.zip'
+    output = work / 'overlapped'
+    start = time.perf_counter()
+    staged_zip_to_csv(str(zip_path), str(output), workers=workers)
+    elapsed = time.perf_counter() - start
+    return elapsed, len(_xml_files(output / 'extracted')), zip_path.stat().st_size
+
+def _run_stage(stage: str, work: str, workers: int, queue):
+    """新しいプロセスで1つの段階を実行し、結果を queue に入れます。"""
+    work = Path(work)
+    # 各モジュールのログファイルを作業ディレクトリに作らせます
+    os.chdir(work)
+    elapsed, files, size = globals()[f'_stage_{stage}'](work, workers)
+    queue.put({
+        'stage': stage,
+        'seconds': round(elapsed, 6),
+        'files': files,
+        'bytes': size,
+        'files_per_s': round(files / elapsed, 3) if elapsed else None,
+        'mb_per_s': round(size / 1024 / 1024 / elapsed, 3) if size is not None and elapsed else None,
+        'peak_rss_kb': _peak_rss_kb(),
+    })
+
+def _git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=Path(__file__).resolve().parent, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_suite(count: int = 500, paragraphs: int = 40, applicants: int = 2, inventors: int = 3,
+              workers: int = 1, stages: list = STAGES) -> dict:
+    """合成コーパスを作成して各段階を計測し、結果を辞書で返します。
+
+    stages に含まれない前提の段階も実行しますが、結果には含めません。
+    """
+    context = multiprocessing.get_context('spawn')
+    required = {stage for requested in stages for stage in PREREQUISITES.get(requested, [])} | set(stages)
+    results = []
+    with tempfile.TemporaryDirectory() as work:
+        write_zip_corpus(Path(work) / 'corpus.zip', count, paragraphs=paragraphs,
+                         applicants=applicants, inventors=inventors)
+        for stage in STAGES:
+            if stage not in required:
+                continue
+            queue = context.Queue()
+            process = context.Process(target=_run_stage, args=(stage, work, workers, queue))
+            process.start()
+            process.join()
+            if process.exitcode != 0:
+                raise RuntimeError(f"段階 '{stage}' の実行に失敗しました（終了コード {process.exitcode}）。")
+            result = queue.get()
+            if stage in stages:
+                results.append(result)
+    return {
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'revision': _git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'corpus': {'count': count, 'paragraphs': paragraphs, 'applicants': applicants,
+                   'inventors': inventors, 'encoding': 'euc_jp'},
+        'workers': workers,
+        'stages': results,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--count', type=int, default=500, help='生成する文書数')
+    parser.add_argument('--paragraphs', type=int, default=40, help='実施形態の段落数')
+    parser.add_argument('--applicants', type=int, default=2, help='出願人の数')
+    parser.add_argument('--inventors', type=int, default=3, help='発明者の数')
+    parser.add_argument('--workers', type=int, default=1, help='並列化できる段階で使うプロセス数')
+    parser.add_argument('--stage', action='append', choices=STAGES,
+                        help='計測する段階（複数指定可、既定はすべて。unzip・transcode は後続の段階の入力を作ります）')
+    parser.add_argument('--output', help='結果を書き出すJSONファイル（省略時は標準出力）')
+    args = parser.parse_args()
+
+    stages = args.stage or STAGES
+    report = run_suite(args.count, args.paragraphs, args.applicants, args.inventors, args.workers, stages)
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        Path(args.output).write_text(text + '\n', encoding='utf_8')
+    else:
+        print(text)
+
+if __name__ == '__main__':
+    main()